@@ -0,0 +1,234 @@
+"""
+Long-running step jobs.
+
+A step request for 100000 steps would block its HTTP request for minutes, so
+large runs are submitted as jobs instead. A job advances its session on a
+background thread in short chunks, each under the session's lock, so step
+requests, streams and controls on the same session interleave with it. The
+chunk size adapts to the measured step rate (about `chunk_seconds` per
+chunk), which also bounds how long cancellation takes to be noticed.
+
+With `snapshot_every=k` the job copies the session's frame every k steps;
+clients fetch them by index while the job is still running. The copies of
+all jobs together are bounded by `max_snapshot_bytes`: past it the oldest
+snapshots are dropped, so a long run keeps its most recent frames.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import kinds
+
+QUEUED, RUNNING, DONE, CANCELLED, FAILED = "queued", "running", "done", "cancelled", "failed"
+FINISHED = (DONE, CANCELLED, FAILED)
+
+
+class Job:
+    def __init__(self, session_id: str, session: Dict[str, Any], steps: int, snapshot_every: int):
+        self.job_id = str(uuid.uuid4())
+        self.session_id = session_id
+        self.session = session
+        self.steps = steps
+        self.snapshot_every = snapshot_every
+        self.state = QUEUED
+        self.steps_done = 0
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        # (steps done when taken, meta, copied fields), oldest first; the
+        # first `snapshots_dropped` taken are gone
+        self.snapshots: "deque[Tuple[int, Dict[str, Any], Dict[str, np.ndarray]]]" = deque()
+        self.snapshots_dropped = 0
+        self.snapshot_nbytes = 0
+        self.cancel_event = threading.Event()
+
+    def snapshot(self, index: int) -> Tuple[int, Dict[str, Any], Dict[str, np.ndarray]]:
+        """
+        Snapshot number `index` in the order taken (negative: from the
+        latest). Raises IndexError if it is not taken yet or was dropped.
+        """
+        if index >= 0:
+            index -= self.snapshots_dropped
+            if index < 0:
+                raise IndexError("Snapshot was dropped to bound memory")
+        if not -len(self.snapshots) <= index < len(self.snapshots):
+            raise IndexError("Snapshot not recorded yet")
+        return self.snapshots[index]
+
+    def status(self) -> Dict[str, Any]:
+        end = self.finished or time.time()
+        elapsed = end - self.started if self.started is not None else 0.0
+        rate = self.steps_done / elapsed if elapsed > 0 else None
+        remaining = self.steps - self.steps_done
+        eta = remaining / rate if rate and self.state == RUNNING else None
+        return {
+            "job_id": self.job_id,
+            "session_id": self.session_id,
+            "state": self.state,
+            "steps": self.steps,
+            "steps_done": self.steps_done,
+            "progress": self.steps_done / self.steps if self.steps else 1.0,
+            "steps_per_second": rate,
+            "elapsed_seconds": elapsed,
+            "eta_seconds": eta,
+            "snapshot_every": self.snapshot_every,
+            "snapshots": self.snapshots_dropped + len(self.snapshots),
+            "snapshots_dropped": self.snapshots_dropped,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Runs jobs on a small thread pool. `lock_for(session)` returns the lock
+    that serialises access to a session; `alive(session_id)` reports whether
+    the session still exists (and marks it as used), so a job stops when its
+    session is deleted or expires. At most `max_finished` finished jobs are
+    kept for polling; older ones are dropped first. Snapshots of all jobs
+    together are kept under `max_snapshot_bytes` (0: no limit) by dropping
+    the oldest, though every job keeps at least its latest one.
+    """
+    def __init__(self, lock_for: Callable[[Dict[str, Any]], threading.Lock],
+                 alive: Callable[[str], bool], max_workers: int = 2,
+                 max_finished: int = 100, chunk_seconds: float = 0.1,
+                 max_snapshot_bytes: int = 256 * 1024 * 1024):
+        self.lock_for = lock_for
+        self.alive = alive
+        self.max_finished = max_finished
+        self.chunk_seconds = chunk_seconds
+        self.max_snapshot_bytes = max_snapshot_bytes
+        self.snapshot_bytes = 0
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        # The job of every retained snapshot, in the order they were taken
+        self._snapshot_order: "deque[Job]" = deque()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+
+    def submit(self, session_id: str, session: Dict[str, Any], steps: int, snapshot_every: int = 0) -> Job:
+        if steps < 1:
+            raise ValueError("steps must be positive")
+        if snapshot_every < 0:
+            raise ValueError("snapshot_every must not be negative")
+        job = Job(session_id, session, steps, snapshot_every)
+        with self._lock:
+            self.jobs[job.job_id] = job
+            self._prune_locked()
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Job:
+        """Raises KeyError for unknown jobs."""
+        with self._lock:
+            return self.jobs[job_id]
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = list(self.jobs.values())
+        return [job.status() for job in jobs]
+
+    def snapshot(self, job_id: str, index: int) -> Tuple[int, Dict[str, Any], Dict[str, np.ndarray]]:
+        """Raises KeyError for unknown jobs and IndexError for missing snapshots."""
+        with self._lock:
+            return self.jobs[job_id].snapshot(index)
+
+    def cancel(self, job_id: str) -> Job:
+        job = self.get(job_id)
+        job.cancel_event.set()
+        return job
+
+    def remove(self, job_id: str):
+        job = self.cancel(job_id)
+        with self._lock:
+            self.jobs.pop(job.job_id, None)
+            self._release_snapshots_locked(job)
+
+    def _prune_locked(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.state in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            self._release_snapshots_locked(self.jobs.pop(job_id))
+
+    def _release_snapshots_locked(self, job: Job):
+        self.snapshot_bytes -= job.snapshot_nbytes
+        job.snapshots.clear()
+        job.snapshot_nbytes = 0
+        self._snapshot_order = deque(j for j in self._snapshot_order if j is not job)
+
+    def _capture(self, job: Job):
+        meta, fields = kinds.frame(job.session)
+        fields = {name: np.array(arr, copy=True) for name, arr in fields.items()}
+        nbytes = sum(arr.nbytes for arr in fields.values())
+        with self._lock:
+            if self.jobs.get(job.job_id) is not job:
+                return # removed while running
+            job.snapshots.append((job.steps_done, meta, fields))
+            job.snapshot_nbytes += nbytes
+            self.snapshot_bytes += nbytes
+            self._snapshot_order.append(job)
+            if self.max_snapshot_bytes:
+                self._evict_snapshots_locked()
+
+    def _evict_snapshots_locked(self):
+        # Oldest first, skipping a job's last snapshot, which stays in place
+        kept = []
+        while self.snapshot_bytes > self.max_snapshot_bytes and self._snapshot_order:
+            job = self._snapshot_order.popleft()
+            if len(job.snapshots) == 1:
+                kept.append(job)
+                continue
+            _, _, fields = job.snapshots.popleft()
+            nbytes = sum(arr.nbytes for arr in fields.values())
+            job.snapshot_nbytes -= nbytes
+            job.snapshots_dropped += 1
+            self.snapshot_bytes -= nbytes
+        self._snapshot_order.extendleft(reversed(kept))
+
+    def _run(self, job: Job):
+        job.state = RUNNING
+        job.started = time.time()
+        chunk = 1
+        lock = self.lock_for(job.session)
+        try:
+            while job.steps_done < job.steps:
+                if job.cancel_event.is_set():
+                    job.state = CANCELLED
+                    break
+                if not self.alive(job.session_id):
+                    raise RuntimeError("Session was removed")
+
+                n = min(chunk, job.steps - job.steps_done)
+                if job.snapshot_every:
+                    # Stop exactly on the next snapshot boundary
+                    n = min(n, job.snapshot_every - job.steps_done % job.snapshot_every)
+                started = time.perf_counter()
+                with lock:
+                    kinds.advance(job.session, n)
+                    job.steps_done += n
+                    if job.snapshot_every and job.steps_done % job.snapshot_every == 0:
+                        self._capture(job)
+                elapsed = time.perf_counter() - started
+
+                # Aim for chunk_seconds per chunk, growing at most 4x at a time
+                per_step = elapsed / n
+                target = int(self.chunk_seconds / per_step) if per_step > 0 else chunk * 4
+                chunk = max(1, min(chunk * 4, target))
+            else:
+                job.state = DONE
+        except Exception as e:
+            job.state = FAILED
+            job.error = str(e)
+        job.finished = time.time()
+        with self._lock:
+            self._prune_locked()
+
+    def shutdown(self):
+        with self._lock:
+            jobs = list(self.jobs.values())
+        for job in jobs:
+            job.cancel_event.set()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,418 @@
+"""
+Per-kind session hooks.
+
+Every session is a dict with a "type" key plus the simulation object(s) it
+owns. The HTTP step endpoints and the WebSocket streaming loop both go through
+the hooks here, so a session steps and serializes the same way regardless of
+how it is driven:
+
+    create(kind, params)     -> a new session dict
+    advance(session, steps, actions) -> run the simulation forward
+    advance_to(session, t)   -> adaptive-step physics sessions to a target time
+    frame(session)           -> (meta, fields) ready for transport.py
+    grid_shape(session, fields) -> the shape of the grid fields, for lod.py
+    control(session, msg)    -> apply an in-band action (injections, toggles)
+    stack_key / advance_stacked -> step compatible sessions together (batches)
+
+A session may also carry a "recorder" (see recorder.py); advance() appends
+its due frames.
+
+Sessions living in a worker process (see workers.py) carry a "remote" handle
+instead of simulation objects; the hooks forward to it.
+"""
+import importlib
+import os
+import sys
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+Frame = Tuple[Dict[str, Any], Dict[str, np.ndarray]]
+
+
+class KindHooks(NamedTuple):
+    create: Callable[..., Dict[str, Any]]
+    advance: Callable[..., None]
+    frame: Callable[[Dict[str, Any]], Frame]
+    # (shape_of(session), advance_many(sessions, steps)) for kernels that can
+    # step several same-shaped sessions in one call
+    stacked: Optional[Tuple[Callable, Callable]] = None
+    # Whether advance takes per-tick `actions` (terraforming toggles);
+    # other kinds ignore them
+    actions: bool = False
+    # Whether the frame's fields live on a grid; N-body positions do not
+    grid: bool = True
+
+
+REGISTRY: Dict[str, KindHooks] = {}
+
+
+def register(kind: str, create, advance, frame, stacked=None, actions=False, grid=True):
+    REGISTRY[kind] = KindHooks(create, advance, frame, stacked, actions, grid)
+
+
+def _load(module: str, name: str):
+    """
+    Import a simulation class on first use. Simulation modules pull in
+    scipy.sparse/signal/ndimage, so importing them all up front would make
+    every API process pay for kinds it never serves.
+    """
+    return getattr(importlib.import_module(module), name)
+
+
+def shared_nbytes() -> int:
+    """
+    Memory of the operator cache that physics sessions share (see
+    session_store.py). Nothing is cached until a physics session has loaded
+    the diffusion module, which this does not import.
+    """
+    diffusion = sys.modules.get("simulations.physics_engine.models.diffusion")
+    return diffusion.operator_cache_nbytes() if diffusion is not None else 0
+
+
+# Float precision of grid fields for sessions that do not pass `dtype`.
+# SIM_DTYPE=float32 halves the memory of every float field; automata boards
+# are always uint8.
+FIELD_DTYPES = ("float32", "float64")
+DEFAULT_DTYPE = os.environ.get("SIM_DTYPE", "float64")
+
+
+def _field_dtype(dtype: Optional[str] = None) -> np.dtype:
+    dtype = dtype or DEFAULT_DTYPE
+    if dtype not in FIELD_DTYPES:
+        raise ValueError(f"Unknown dtype '{dtype}', expected one of {FIELD_DTYPES}")
+    return np.dtype(dtype)
+
+
+# --- Physics ---
+def _create_physics(type: str = "diffusion", nx: int = 50, ny: int = 50, dt: float = 0.01, param: float = 0.1,
+                    integrator: Optional[str] = None, operator: str = "csr", fast_forward: bool = True,
+                    dtype: Optional[str] = None):
+    dtype = _field_dtype(dtype)
+    Grid2D = _load("simulations.physics_engine.grid.grid2d", "Grid2D")
+    SimulationEnvironment = _load("simulations.physics_engine.env.environment", "SimulationEnvironment")
+    get_integrator = _load("simulations.physics_engine.core.integrator", "get_integrator")
+    grid = Grid2D(nx, ny)
+
+    if type == "diffusion":
+        DiffusionModel = _load("simulations.physics_engine.models.diffusion", "DiffusionModel")
+        model = DiffusionModel(grid, diffusivity=param, backend=operator)
+        # Spectral operators advance exactly by default
+        integrator = integrator or ("exact" if operator == "spectral" else "euler")
+        env = SimulationEnvironment(nx, ny, dt, model.get_operator(), get_integrator(integrator),
+                                    fast_forward=fast_forward)
+
+        # Init with center bump
+        X, Y = grid.get_coordinates()
+        initial_field = np.exp(-((X - 0.5)**2 + (Y - 0.5)**2) / 0.02)
+        env.set_state(initial_field.astype(dtype, copy=False))
+
+        return {"type": "physics", "env": env}
+    if type == "wave":
+        WaveModel = _load("simulations.physics_engine.models.wave", "WaveModel")
+        model = WaveModel(grid, wave_speed=param, backend=operator)
+        env = SimulationEnvironment(nx, ny, dt, model.get_operator(), get_integrator(integrator or "verlet"),
+                                    fast_forward=fast_forward)
+
+        # Released from rest as a center bump
+        X, Y = grid.get_coordinates()
+        bump = np.exp(-((X - 0.5)**2 + (Y - 0.5)**2) / 0.005)
+        env.set_state_vector(model.initial_state(bump.astype(dtype, copy=False)))
+
+        # Frames name the displacement "field", like diffusion
+        return {"type": "physics", "env": env, "fields": ("field", "velocity")}
+    raise ValueError("Unknown physics model")
+
+def _advance_physics(session, steps):
+    session["env"].advance(steps)
+
+def _frame_physics(session) -> Frame:
+    env = session["env"]
+    fields = env.get_fields()
+    field = fields[0]
+    meta = {
+        "t": env.t,
+        "min": float(np.min(field)),
+        "max": float(np.max(field))
+    }
+    if env.last_advance is not None:
+        # Whether the last advance stepped or fast-forwarded with exp(t*A)
+        meta["advance"] = env.last_advance
+    return meta, dict(zip(session.get("fields", ("field",)), fields))
+
+register("physics", _create_physics, _advance_physics, _frame_physics)
+
+
+# --- Mars ---
+def _create_mars(nx: int = 100, ny: int = 100, dtype: Optional[str] = None):
+    env = _load("simulations.mars.mars_env", "MarsEnvironment")(nx, ny, dtype=_field_dtype(dtype))
+    env.add_rover(10.0, 10.0) # Default rover
+    return {"type": "mars", "env": env}
+
+def _advance_mars(session, steps):
+    env = session["env"]
+    # Mars step takes dt
+    for _ in range(steps):
+        env.step(dt=0.1)
+
+def _frame_mars(session) -> Frame:
+    state = session["env"].get_state()
+    terrain = state.pop("terrain")
+    return state, {"terrain": terrain}
+
+register("mars", _create_mars, _advance_mars, _frame_mars)
+
+
+# --- Venus / Volcano ---
+def _create_venus(nx: int = 100, ny: int = 50, dtype: Optional[str] = None):
+    env = _load("simulations.venus.venus_env", "VenusEnvironment")(nx, ny, dtype=_field_dtype(dtype))
+    return {"type": "venus", "env": env}
+
+def _create_volcano(nx: int = 50, ny: int = 50, dtype: Optional[str] = None):
+    env = _load("simulations.earth.volcano", "VolcanoEnvironment")(nx, ny, dtype=_field_dtype(dtype))
+    return {"type": "volcano", "env": env}
+
+def _advance_env(session, steps):
+    env = session["env"]
+    for _ in range(steps):
+        env.step()
+
+def _frame_env(session) -> Frame:
+    return {}, session["env"].get_state()
+
+register("venus", _create_venus, _advance_env, _frame_env)
+register("volcano", _create_volcano, _advance_env, _frame_env)
+
+
+# --- Terraforming ---
+def _create_terraform(planet: str = "Mars"):
+    return {"type": "terraform", "sim": _load("simulations.terraforming.terraformer", "TerraformingSim")(planet)}
+
+def _advance_terraform(session, steps, actions=None):
+    sim = session["sim"]
+    if actions is None:
+        actions = session.get("actions", {})
+    for _ in range(steps):
+        sim.step(actions)
+
+def _frame_terraform(session) -> Frame:
+    return session["sim"].get_state(), {}
+
+register("terraform", _create_terraform, _advance_terraform, _frame_terraform, actions=True)
+
+
+# --- Automata ---
+def _create_automata(nx: int = 50, ny: int = 50):
+    return {"type": "automata", "sim": _load("simulations.automata.game_of_life", "GameOfLife")(nx, ny)}
+
+def _advance_sim(session, steps):
+    sim = session["sim"]
+    for _ in range(steps):
+        sim.step()
+
+def _advance_automata_stacked(sessions, steps):
+    sims = [session["sim"] for session in sessions]
+    for _ in range(steps):
+        type(sims[0]).step_many(sims)
+
+def _stack_shape_automata(session):
+    return session["sim"].grid.shape
+
+def _frame_automata(session) -> Frame:
+    return {}, {"grid": session["sim"].get_state()}
+
+register("automata", _create_automata, _advance_sim, _frame_automata,
+         stacked=(_stack_shape_automata, _advance_automata_stacked))
+
+
+# --- Fluid ---
+def _create_fluid(nx: int = 64, ny: int = 64, projection: bool = False, dtype: Optional[str] = None):
+    sim = _load("simulations.fluid.smoke", "FluidSimulation")(nx, ny, projection=projection, dtype=_field_dtype(dtype))
+    return {"type": "fluid", "sim": sim}
+
+def _frame_fluid(session) -> Frame:
+    return {}, session["sim"].get_state()
+
+register("fluid", _create_fluid, _advance_sim, _frame_fluid)
+
+
+# --- Universe ---
+def _create_universe(num_bodies: int = 100, G: float = 1.0, dt: float = 0.01):
+    sim = _load("simulations.universe.nbody", "NBodySimulation")(num_bodies, G, dt=dt)
+
+    # Init disk
+    n = num_bodies
+    angles = np.random.rand(n) * 2 * np.pi
+    radii = np.random.rand(n) * 2 + 0.5
+    sim.pos[:, 0] = radii * np.cos(angles)
+    sim.pos[:, 1] = radii * np.sin(angles)
+    v_mag = np.sqrt(sim.G * n / radii)
+    sim.vel[:, 0] = -v_mag * np.sin(angles)
+    sim.vel[:, 1] = v_mag * np.cos(angles)
+
+    return {"type": "universe", "sim": sim}
+
+def _frame_universe(session) -> Frame:
+    sim = session["sim"]
+    state = sim.get_state()
+    return {"t": sim.t}, {"positions": state["positions"]}
+
+register("universe", _create_universe, _advance_sim, _frame_universe, grid=False)
+
+
+# --- Algorithms ---
+SORTS = {
+    "bubble_sort": "bubble_sort_steps",
+    "merge_sort": "merge_sort_steps",
+    "quick_sort": "quick_sort_steps",
+}
+
+def _create_algo(type: str = "bubble_sort", data=()):
+    if type not in SORTS:
+        raise ValueError("Unknown algorithm")
+    steps = _load("simulations.algorithms.sorting", SORTS[type])
+    return {"type": "algo", "gen": steps(list(data)), "done": False}
+
+def _advance_algo(session, steps):
+    # Algorithms step once per call regardless of `steps`
+    if session["done"]:
+        session["last"] = None
+        return
+    try:
+        session["last"] = next(session["gen"])
+    except StopIteration:
+        session["done"] = True
+        session["last"] = None
+
+def _frame_algo(session) -> Frame:
+    last = session.get("last")
+    if session["done"] or last is None:
+        return {"done": True}, {}
+    state, indices, swapped = last
+    return {
+        "done": False,
+        "data": state,
+        "indices": indices,
+        "swapped": swapped
+    }, {}
+
+register("algo", _create_algo, _advance_algo, _frame_algo)
+
+
+
+def create(kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build a new session of `kind` from request parameters.
+    Raises ValueError for unknown kinds or model types.
+    """
+    if kind not in REGISTRY:
+        raise ValueError(f"Unknown simulation kind '{kind}'")
+    return REGISTRY[kind].create(**params)
+
+
+def advance(session: Dict[str, Any], steps: int, actions: Optional[Dict[str, bool]] = None):
+    """
+    Advance a session by `steps` steps. With an active "recorder" (see
+    recorder.py) the run is split so every due frame gets recorded.
+    """
+    recorder = session.get("recorder")
+    if recorder is None or not recorder.active:
+        _advance(session, steps, actions)
+        return
+    while steps > 0:
+        n = min(steps, recorder.steps_until_due())
+        _advance(session, n, actions)
+        steps -= n
+        if recorder.advance(n):
+            recorder.append(frame(session)[1])
+
+
+def _advance(session: Dict[str, Any], steps: int, actions: Optional[Dict[str, bool]] = None):
+    if "remote" in session:
+        session["remote"].advance(steps, actions)
+        return
+    hooks = REGISTRY[session["type"]]
+    if hooks.actions:
+        hooks.advance(session, steps, actions)
+    else:
+        hooks.advance(session, steps)
+
+
+def advance_to(session: Dict[str, Any], t_end: float, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Advance a physics session to time `t_end` with adaptive steps (see
+    SimulationEnvironment.advance_to) and return the integrator's stats.
+    """
+    if "remote" in session:
+        return session["remote"].advance_to(t_end, options)
+    if session["type"] != "physics":
+        raise ValueError(f"{session['type']} sessions do not support adaptive stepping")
+    return session["env"].advance_to(t_end, **options)
+
+
+def stack_key(session: Dict[str, Any], steps: int) -> Optional[Tuple]:
+    """
+    Sessions with equal, non-None keys can go through advance_stacked together.
+    """
+    if "remote" in session or "recorder" in session:
+        return None
+    stacked = REGISTRY[session["type"]].stacked
+    if stacked is None:
+        return None
+    shape_of, _ = stacked
+    return (session["type"], shape_of(session), steps)
+
+
+def advance_stacked(sessions: List[Dict[str, Any]], steps: int):
+    """Advance sessions sharing a stack_key in one batched kernel call."""
+    _, advance_many = REGISTRY[sessions[0]["type"]].stacked
+    advance_many(sessions, steps)
+
+
+def frame(session: Dict[str, Any]) -> Frame:
+    """Current state of a session as (meta, fields)."""
+    if "remote" in session:
+        return session["remote"].frame()
+    return REGISTRY[session["type"]].frame(session)
+
+
+def grid_shape(session: Dict[str, Any], fields: Dict[str, np.ndarray]) -> Optional[Tuple[int, int]]:
+    """
+    Shape of the session's grid fields, taken from the frame's first field
+    (every grid field of a kind shares it), or None if the kind has no grid.
+    """
+    if not REGISTRY[session["type"]].grid:
+        return None
+    for arr in fields.values():
+        shape = np.shape(arr)
+        return shape if len(shape) == 2 else None
+    return None
+
+
+def control(session: Dict[str, Any], message: Dict[str, Any]):
+    """
+    Apply an in-band control message to a session.
+    Raises ValueError for messages the session's kind does not understand.
+    """
+    if "remote" in session:
+        session["remote"].control(message)
+        return
+
+    kind = session["type"]
+    action = message.get("type")
+
+    if kind == "fluid" and action == "add_density":
+        color = message.get("color", (1.0, 1.0, 1.0))
+        session["sim"].add_density(int(message["x"]), int(message["y"]),
+                                   float(message["amount"]), color=tuple(color))
+    elif kind == "fluid" and action == "add_velocity":
+        session["sim"].add_velocity(int(message["x"]), int(message["y"]),
+                                    float(message["u"]), float(message["v"]))
+    elif kind == "terraform" and action == "actions":
+        # Toggles persist across ticks, like the switches in the UI
+        session["actions"] = {k: bool(v) for k, v in message.get("actions", {}).items()}
+    else:
+        raise ValueError(f"Unsupported control message '{action}' for {kind} session")
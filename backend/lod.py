@@ -0,0 +1,81 @@
+"""
+Region-of-interest and level-of-detail reduction for grid fields.
+
+A client showing a large board on a small canvas can ask for just a
+viewport `(x0, y0, x1, y1)` (half-open, in cell indices along axes 0 and 1)
+and a target `resolution` `(w, h)`. Every field of the session's grid shape
+is cropped to the viewport and, if it is larger than the target, reduced to exactly
+`w x h` cells. Output cell `(i, j)` covers source rows
+`x0 + ex[i] .. x0 + ex[i+1]` and columns `y0 + ey[j] .. y0 + ey[j+1]` where
+
+    ex[k] = k * (x1 - x0) // w        ey[k] = k * (y1 - y0) // h
+
+"mean" averages each block; "stride" takes the block's first cell.
+Other fields (e.g. N-body positions, shaped (n, 2)) pass through unchanged.
+"""
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+LOD_MODES = ("mean", "stride")
+
+
+def _edges(length: int, out: int) -> np.ndarray:
+    return (np.arange(out + 1) * length) // out
+
+
+def _reduce(arr: np.ndarray, ex: np.ndarray, ey: np.ndarray, mode: str) -> np.ndarray:
+    if mode == "stride":
+        return arr[ex[:-1]][:, ey[:-1]]
+    sums = np.add.reduceat(np.add.reduceat(arr, ex[:-1], axis=0, dtype=np.float64), ey[:-1], axis=1)
+    counts = np.outer(np.diff(ex), np.diff(ey))
+    return sums / counts
+
+
+def reduce_fields(fields: Dict[str, np.ndarray], viewport: Optional[Sequence[int]] = None,
+                  resolution: Optional[Sequence[int]] = None,
+                  mode: str = "mean",
+                  grid_shape: Optional[Sequence[int]] = None) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Crop and down-sample the fields of a frame shaped `grid_shape` (see
+    kinds.grid_shape); with no grid shape every field passes through.
+    Returns (lod meta, reduced fields). Raises ValueError for bad arguments.
+    """
+    if viewport is not None and len(viewport) != 4:
+        raise ValueError("viewport must be [x0, y0, x1, y1]")
+    if resolution is not None and (len(resolution) != 2 or min(resolution) < 1):
+        raise ValueError("resolution must be [width, height] with positive entries")
+    if mode not in LOD_MODES:
+        raise ValueError(f"lod mode must be one of {LOD_MODES}")
+
+    meta: Dict[str, Any] = {}
+    reduced = {}
+    for name, arr in fields.items():
+        arr = np.asarray(arr)
+        if grid_shape is None or arr.shape != tuple(grid_shape):
+            reduced[name] = arr
+            continue
+
+        nx, ny = arr.shape
+        x0, y0, x1, y1 = viewport if viewport is not None else (0, 0, nx, ny)
+        x0, x1 = max(0, min(nx, x0)), max(0, min(nx, x1))
+        y0, y1 = max(0, min(ny, y0)), max(0, min(ny, y1))
+        if x1 <= x0 or y1 <= y0:
+            raise ValueError("viewport does not overlap the grid")
+        region = arr[x0:x1, y0:y1]
+
+        w, h = resolution if resolution is not None else region.shape
+        w, h = min(w, region.shape[0]), min(h, region.shape[1])
+        if (w, h) != region.shape:
+            out = _reduce(region, _edges(region.shape[0], w), _edges(region.shape[1], h), mode)
+        else:
+            out = region
+
+        reduced[name] = out
+        meta.setdefault("range", {})[name] = [float(np.min(region)), float(np.max(region))]
+        meta["viewport"] = [x0, y0, x1, y1]
+        meta["shape"] = [w, h]
+        meta["scale"] = [region.shape[0] / w, region.shape[1] / h]
+        meta["mode"] = mode
+
+    return meta, reduced
@@ -1,26 +1,33 @@
 import sys
 import os
 import uuid
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from typing import Dict, Any, List, Optional
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response
 from pydantic import BaseModel
 import numpy as np
 
 # Add parent directory to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from simulations.physics_engine.grid.grid2d import Grid2D
-from simulations.physics_engine.models.diffusion import DiffusionModel
-from simulations.physics_engine.env.environment import SimulationEnvironment
-from simulations.universe.nbody import NBodySimulation
-from simulations.mars.mars_env import MarsEnvironment
-from simulations.venus.venus_env import VenusEnvironment
-from simulations.earth.volcano import VolcanoEnvironment
-from simulations.terraforming.terraformer import TerraformingSim
-from simulations.automata.game_of_life import GameOfLife
-from simulations.fluid.smoke import FluidSimulation
-from simulations.algorithms.sorting import bubble_sort_steps, merge_sort_steps, quick_sort_steps
+import transport
+import kinds
+from delta import DeltaEncoder
+from lod import reduce_fields
+from session_store import SessionStore
+from workers import WorkerPool
+from metrics import Metrics, grid_label
+from jobs import JobManager
+from recorder import FrameRecorder
+import snapshots
 
 app = FastAPI(title="Simulation Platform API")
 
@@ -32,8 +39,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory session storage
-sessions: Dict[str, Any] = {}
+# In-memory session storage: idle sessions expire after SIM_SESSION_TTL seconds
+# and least recently used ones are evicted above SIM_SESSION_MAX_MB (0 = no limit)
+SESSION_TTL = float(os.environ.get("SIM_SESSION_TTL", 1800))
+SESSION_MAX_MB = float(os.environ.get("SIM_SESSION_MAX_MB", 1024))
+
+# SIM_WORKERS > 0 runs sessions in that many worker processes (see workers.py)
+SIM_WORKERS = int(os.environ.get("SIM_WORKERS", 0))
+workers: Optional[WorkerPool] = None
+_workers_lock = threading.Lock()
+
+def _on_session_removed(session_id: str, session: Dict[str, Any]):
+    if "remote" in session:
+        session["remote"].close()
+    if "recorder" in session:
+        session["recorder"].delete()
+
+# Session snapshots (see snapshots.py)
+SNAPSHOT_DIR = os.environ.get("SIM_SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots"))
+
+# Step/serialisation histograms served at /metrics; SIM_METRICS=0 turns recording off
+metrics = Metrics(enabled=os.environ.get("SIM_METRICS", "1") not in ("0", "false", ""))
+
+# Frame recordings (see recorder.py), deleted with their session
+RECORD_DIR = os.environ.get("SIM_RECORD_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings"))
+
+sessions = SessionStore(
+    ttl=SESSION_TTL or None,
+    max_bytes=int(SESSION_MAX_MB * 1024 * 1024) or None,
+    on_remove=_on_session_removed,
+    shared_nbytes=kinds.shared_nbytes,
+)
 
 # --- Data Models ---
 class CreatePhysicsRequest(BaseModel):
@@ -42,8 +78,13 @@ class CreatePhysicsRequest(BaseModel):
     ny: int = 50
     dt: float = 0.01
     param: float = 0.1 # diffusivity or wave_speed
-
-    param: float = 0.1 # diffusivity or wave_speed
+    # euler, rk4, backward_euler, crank_nicolson (implicit: stable at any dt),
+    # exact (spectral only; the default there), verlet (wave only; the default there)
+    integrator: Optional[str] = None
+    operator: str = "csr" # csr (sparse matrix), stencil (matrix-free) or spectral (periodic, FFT)
+    # Let large `steps` requests jump ahead with exp(steps*dt*A) when cheaper
+    fast_forward: bool = True
+    dtype: Optional[str] = None # float32 or float64 fields (default SIM_DTYPE, float64)
 
 
 class CreateUniverseRequest(BaseModel):
@@ -54,14 +95,17 @@ class CreateUniverseRequest(BaseModel):
 class CreateMarsRequest(BaseModel):
     nx: int = 100
     ny: int = 100
+    dtype: Optional[str] = None # float32 or float64 fields
 
 class CreateVenusRequest(BaseModel):
     nx: int = 100
     ny: int = 50
+    dtype: Optional[str] = None # float32 or float64 fields
 
 class CreateVolcanoRequest(BaseModel):
     nx: int = 50
     ny: int = 50
+    dtype: Optional[str] = None # float32 or float64 fields
 
 class CreateTerraformRequest(BaseModel):
     planet: str = "Mars"
@@ -77,6 +121,8 @@ class CreateAutomataRequest(BaseModel):
 class CreateFluidRequest(BaseModel):
     nx: int = 64
     ny: int = 64
+    projection: bool = False # pressure projection (incompressible flow)
+    dtype: Optional[str] = None # float32 or float64 fields
 
 class FluidActionRequest(BaseModel):
     session_id: str
@@ -90,264 +136,772 @@ class FluidActionRequest(BaseModel):
 class StepRequest(BaseModel):
     session_id: str
     steps: int = 1
+    # Opt-in changed-cell encoding (see delta.py): `since` is the `seq` of
+    # the last frame the client applied, omitted on the first request
+    delta: bool = False
+    since: Optional[int] = None
+    tolerance: float = 0.0
+    # Optional region of interest [x0, y0, x1, y1] and output size [w, h]
+    # for grid fields (see lod.py)
+    viewport: Optional[List[int]] = None
+    resolution: Optional[List[int]] = None
+    lod_mode: str = "mean"
+    # Send float fields as float32/float16 or uint8/uint16 with per-field
+    # offset/scale (see transport.quantize_fields)
+    precision: Optional[str] = None
+
+class AdvanceRequest(BaseModel):
+    session_id: str
+    # Target time, or a duration from the session's current time
+    t_end: Optional[float] = None
+    duration: Optional[float] = None
+    rtol: float = 1e-6
+    atol: float = 1e-9
+    method: str = "dormand_prince" # or bogacki_shampine
+    precision: Optional[str] = None
+
+class BatchStepEntry(BaseModel):
+    session_id: str
+    steps: int = 1
+    actions: Optional[Dict[str, bool]] = None # terraforming toggles
+    controls: List[Dict[str, Any]] = [] # in-band messages applied before stepping
+
+class BatchStepRequest(BaseModel):
+    entries: List[BatchStepEntry]
+
+class RestoreRequest(BaseModel):
+    restore_rng: bool = False # also restore the global NumPy RNG state
+
+class RecordRequest(BaseModel):
+    enabled: bool = True # false stops recording; frames stay readable
+    every: int = 1 # record every N steps
+    fields: Optional[List[str]] = None # default: every field of the frame
+    chunk_frames: int = 256
+
+class JobRequest(BaseModel):
+    session_id: str
+    steps: int
+    snapshot_every: int = 0 # copy the frame every N steps (0 = never)
 
 class CreateAlgoRequest(BaseModel):
     type: str = "bubble_sort"
     data: List[int]
 
+# --- Session Helpers ---
+
+def get_session(session_id: str, kind: Optional[str] = None) -> Dict[str, Any]:
+    if session_id not in sessions:
+        raise HTTPException(status_code=404, detail="Session not found")
+    session = sessions[session_id]
+    if kind is not None and session["type"] != kind:
+        raise HTTPException(status_code=400, detail=f"Session is not a {kind} session")
+    return session
+
+def get_workers() -> WorkerPool:
+    global workers
+    # Started lazily so spawned workers never re-run this at import time
+    with _workers_lock:
+        if workers is None:
+            workers = WorkerPool(SIM_WORKERS)
+    return workers
+
+def create_session(kind: str, req: BaseModel) -> Dict[str, str]:
+    session_id = str(uuid.uuid4())
+    params = req.model_dump()
+    try:
+        if SIM_WORKERS > 0:
+            session = get_workers().create(session_id, kind, params)
+        else:
+            session = kinds.create(kind, params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    sessions[session_id] = session
+    return {"session_id": session_id}
+
+def session_lock(session: Dict[str, Any]) -> threading.Lock:
+    """Per-session lock so HTTP steps and streaming ticks never interleave."""
+    return session.setdefault("lock", threading.Lock())
+
+# --- Frame Rendering ---
+
+def render_frame(request: Request, meta: Dict[str, Any], fields: Dict[str, np.ndarray]) -> Response:
+    """
+    Send a frame as JSON (default) or, if the client accepts it, as a binary
+    frame that writes the array buffers directly (see transport.py).
+    """
+    if transport.wants_binary(request.headers.get("accept", "")):
+        return Response(content=transport.encode_frame(meta, fields),
+                        media_type=transport.FRAME_MEDIA_TYPE)
+    # Encoded here rather than by FastAPI so the body size is known
+    body = json.dumps(transport.frame_to_json(meta, fields), default=transport.json_default)
+    return Response(content=body, media_type="application/json")
+
 # --- Endpoints ---
 
+def step_session(req: StepRequest, request: Request, kind: str):
+    session = get_session(req.session_id, kind)
+    use_lod = req.viewport is not None or req.resolution is not None
+    if use_lod:
+        try:
+            reduce_fields({}, req.viewport, req.resolution, req.lod_mode)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if req.precision is not None:
+        try:
+            transport.check_precision(req.precision)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    timed = metrics.enabled
+    with session_lock(session):
+        started = time.perf_counter() if timed else 0.0
+        kinds.advance(session, req.steps)
+        stepped = time.perf_counter() if timed else 0.0
+        meta, fields = kinds.frame(session)
+        grid = grid_label(fields) if timed else None
+        if use_lod:
+            try:
+                lod_meta, fields = reduce_fields(fields, req.viewport, req.resolution, req.lod_mode,
+                                                 kinds.grid_shape(session, fields))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            meta = dict(meta, lod=lod_meta)
+        if req.delta:
+            encoder = session.setdefault("delta", DeltaEncoder())
+            delta_meta, fields = encoder.encode(fields, req.since, req.tolerance)
+            meta = dict(meta, **delta_meta)
+        if req.precision is not None:
+            # After delta encoding, so deltas are taken on the true values
+            precision_meta, fields = transport.quantize_fields(fields, req.precision)
+            meta = dict(meta, **precision_meta)
+        # Render while holding the lock; some simulations update fields in place
+        response = render_frame(request, meta, fields)
+    if timed:
+        rendered = time.perf_counter()
+        fmt = "binary" if response.media_type == transport.FRAME_MEDIA_TYPE else "json"
+        metrics.record_step(kind, grid, req.steps, stepped - started)
+        metrics.record_frame(kind, grid, fmt, rendered - stepped, len(response.body))
+    sessions.refresh(req.session_id)
+    return response
+
 @app.get("/")
 def read_root():
     return {"message": "Simulation Platform API is running"}
 
+# Session Management Endpoints
+@app.get("/sessions")
+def list_sessions():
+    listing = sessions.describe()
+    return {
+        "sessions": listing,
+        "count": len(listing),
+        # Operators cached for (and shared by) physics sessions count once
+        "shared_bytes": sessions.shared_bytes,
+        "total_bytes": sum(s["nbytes"] for s in listing) + sessions.shared_bytes,
+        "max_bytes": sessions.max_bytes,
+        "ttl": sessions.ttl,
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """Prometheus text exposition of step latency histograms and live session gauges."""
+    return PlainTextResponse(metrics.render(sessions.describe()), media_type="text/plain; version=0.0.4")
+
+@app.delete("/sessions/{session_id}")
+def delete_session(session_id: str):
+    listing = {s["session_id"]: s for s in sessions.describe()}
+    if session_id not in listing:
+        raise HTTPException(status_code=404, detail="Session not found")
+    del sessions[session_id]
+    return {"status": "deleted", "freed_bytes": listing[session_id]["nbytes"]}
+
 # Physics Endpoints
 @app.post("/sim/physics/create")
 def create_physics(req: CreatePhysicsRequest):
-    session_id = str(uuid.uuid4())
-    
-    grid = Grid2D(req.nx, req.ny)
-    
-    if req.type == "diffusion":
-        model = DiffusionModel(grid, diffusivity=req.param)
-        env = SimulationEnvironment(req.nx, req.ny, req.dt, model.get_operator())
-        
-        # Init with center bump
-        X, Y = grid.get_coordinates()
-        initial_field = np.exp(-((X - 0.5)**2 + (Y - 0.5)**2) / 0.02)
-        env.set_state(initial_field)
-        
-        sessions[session_id] = {"type": "physics", "env": env}
-    else:
-        raise HTTPException(status_code=400, detail="Unknown physics model")
-        
-    return {"session_id": session_id}
+    return create_session("physics", req)
 
 @app.post("/sim/physics/step")
-def step_physics(req: StepRequest):
-    if req.session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    session = sessions[req.session_id]
-    env = session["env"]
-    
-    for _ in range(req.steps):
-        env.step()
-        
-    field = env.get_field()
-    return {
-        "t": env.t,
-        "field": field.tolist(),
-        "min": float(np.min(field)),
-        "max": float(np.max(field))
-    }
+def step_physics(req: StepRequest, request: Request):
+    return step_session(req, request, "physics")
+
+@app.post("/sim/physics/advance")
+def advance_physics(req: AdvanceRequest, request: Request):
+    """
+    Advance to a target time with adaptive, error-controlled steps instead of
+    fixed `dt` steps. The frame's `adaptive` entry reports accepted/rejected
+    steps and operator evaluations against the fixed steps it replaced.
+    """
+    session = get_session(req.session_id, "physics")
+    if (req.t_end is None) == (req.duration is None):
+        raise HTTPException(status_code=400, detail="Give exactly one of t_end or duration")
+    if req.precision is not None:
+        try:
+            transport.check_precision(req.precision)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    options = {"rtol": req.rtol, "atol": req.atol, "method": req.method}
+    with session_lock(session):
+        t_end = req.t_end if req.t_end is not None else kinds.frame(session)[0]["t"] + req.duration
+        try:
+            stats = kinds.advance_to(session, t_end, options)
+        except (ValueError, RuntimeError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        meta, fields = kinds.frame(session)
+        meta = dict(meta, adaptive=stats)
+        if req.precision is not None:
+            precision_meta, fields = transport.quantize_fields(fields, req.precision)
+            meta = dict(meta, **precision_meta)
+        response = render_frame(request, meta, fields)
+    sessions.refresh(req.session_id)
+    return response
 
 # Mars Endpoints
 @app.post("/sim/mars/create")
 def create_mars(req: CreateMarsRequest):
-    session_id = str(uuid.uuid4())
-    env = MarsEnvironment(req.nx, req.ny)
-    env.add_rover(10.0, 10.0) # Default rover
-    sessions[session_id] = {"type": "mars", "env": env}
-    return {"session_id": session_id}
+    return create_session("mars", req)
 
 @app.post("/sim/mars/step")
-def step_mars(req: StepRequest):
-    if req.session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    env = sessions[req.session_id]["env"]
-    # Mars step takes dt
-    for _ in range(req.steps):
-        env.step(dt=0.1)
-        
-    state = env.get_state()
-    # Convert numpy arrays to lists for JSON
-    state["terrain"] = state["terrain"].tolist()
-    return state
+def step_mars(req: StepRequest, request: Request):
+    return step_session(req, request, "mars")
 
 # Venus Endpoints
 @app.post("/sim/venus/create")
 def create_venus(req: CreateVenusRequest):
-    session_id = str(uuid.uuid4())
-    env = VenusEnvironment(req.nx, req.ny)
-    sessions[session_id] = {"type": "venus", "env": env}
-    return {"session_id": session_id}
+    return create_session("venus", req)
 
 @app.post("/sim/venus/step")
-def step_venus(req: StepRequest):
-    if req.session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    env = sessions[req.session_id]["env"]
-    for _ in range(req.steps):
-        env.step()
-    state = env.get_state()
-    state["temperature"] = state["temperature"].tolist()
-    state["clouds"] = state["clouds"].tolist()
-    state["wind_u"] = state["wind_u"].tolist()
-    return state
+def step_venus(req: StepRequest, request: Request):
+    return step_session(req, request, "venus")
 
 # Volcano Endpoints
 @app.post("/sim/volcano/create")
 def create_volcano(req: CreateVolcanoRequest):
-    session_id = str(uuid.uuid4())
-    env = VolcanoEnvironment(req.nx, req.ny)
-    sessions[session_id] = {"type": "volcano", "env": env}
-    return {"session_id": session_id}
+    return create_session("volcano", req)
 
 @app.post("/sim/volcano/step")
-def step_volcano(req: StepRequest):
-    if req.session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    env = sessions[req.session_id]["env"]
-    for _ in range(req.steps):
-        env.step()
-    state = env.get_state()
-    state["terrain"] = state["terrain"].tolist()
-    state["lava"] = state["lava"].tolist()
-    return state
+def step_volcano(req: StepRequest, request: Request):
+    return step_session(req, request, "volcano")
 
 # Terraforming Endpoints
 @app.post("/sim/terraforming/create")
 def create_terraform(req: CreateTerraformRequest):
-    session_id = str(uuid.uuid4())
-    sim = TerraformingSim(req.planet)
-    sessions[session_id] = {"type": "terraform", "sim": sim}
-    return {"session_id": session_id}
+    return create_session("terraform", req)
 
 @app.post("/sim/terraforming/step")
 def step_terraform(req: TerraformActionRequest):
-    if req.session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    sim = sessions[req.session_id]["sim"]
-    sim.step(req.actions)
-    return sim.get_state()
+    session = get_session(req.session_id, "terraform")
+    with session_lock(session):
+        kinds.advance(session, 1, actions=req.actions)
+        meta, _ = kinds.frame(session)
+    return meta
 
 # Automata Endpoints
 @app.post("/sim/automata/create")
 def create_automata(req: CreateAutomataRequest):
-    session_id = str(uuid.uuid4())
-    sim = GameOfLife(req.nx, req.ny)
-    sessions[session_id] = {"type": "automata", "sim": sim}
-    return {"session_id": session_id}
+    return create_session("automata", req)
 
 @app.post("/sim/automata/step")
-def step_automata(req: StepRequest):
-    if req.session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    sim = sessions[req.session_id]["sim"]
-    for _ in range(req.steps):
-        sim.step()
-    return {"grid": sim.get_state().tolist()}
+def step_automata(req: StepRequest, request: Request):
+    return step_session(req, request, "automata")
 
 # Fluid Endpoints
 @app.post("/sim/fluid/create")
 def create_fluid(req: CreateFluidRequest):
-    session_id = str(uuid.uuid4())
-    sim = FluidSimulation(req.nx, req.ny)
-    sessions[session_id] = {"type": "fluid", "sim": sim}
-    return {"session_id": session_id}
+    return create_session("fluid", req)
 
 @app.post("/sim/fluid/step")
-def step_fluid(req: StepRequest):
-    if req.session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    sim = sessions[req.session_id]["sim"]
-    for _ in range(req.steps):
-        sim.step()
-    state = sim.get_state()
-    return {
-        "density": state["density"].tolist(),
-        "velocity_u": state["velocity_u"].tolist(),
-        "velocity_v": state["velocity_v"].tolist(),
-        "r": state["r"].tolist(),
-        "g": state["g"].tolist(),
-        "b": state["b"].tolist()
-    }
+def step_fluid(req: StepRequest, request: Request):
+    return step_session(req, request, "fluid")
 
 @app.post("/sim/fluid/action")
 def action_fluid(req: FluidActionRequest):
-    if req.session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    sim = sessions[req.session_id]["sim"]
-    sim.add_density(req.x, req.y, req.amount, color=(req.r, req.g, req.b))
-    # Add random velocity for swirl
-    sim.add_velocity(req.x, req.y, np.random.randn(), np.random.randn())
+    session = get_session(req.session_id, "fluid")
+    with session_lock(session):
+        kinds.control(session, {"type": "add_density", "x": req.x, "y": req.y,
+                                "amount": req.amount, "color": (req.r, req.g, req.b)})
+        # Add random velocity for swirl
+        kinds.control(session, {"type": "add_velocity", "x": req.x, "y": req.y,
+                                "u": np.random.randn(), "v": np.random.randn()})
     return {"status": "ok"}
 
 # Universe Endpoints
 @app.post("/sim/universe/create")
 def create_universe(req: CreateUniverseRequest):
-    session_id = str(uuid.uuid4())
-    sim = NBodySimulation(req.num_bodies, req.G, dt=req.dt)
-    
-    # Init disk
-    n = req.num_bodies
-    angles = np.random.rand(n) * 2 * np.pi
-    radii = np.random.rand(n) * 2 + 0.5
-    sim.pos[:, 0] = radii * np.cos(angles)
-    sim.pos[:, 1] = radii * np.sin(angles)
-    v_mag = np.sqrt(sim.G * n / radii)
-    sim.vel[:, 0] = -v_mag * np.sin(angles)
-    sim.vel[:, 1] = v_mag * np.cos(angles)
-    
-    sessions[session_id] = {"type": "universe", "sim": sim}
-    return {"session_id": session_id}
+    return create_session("universe", req)
 
 @app.post("/sim/universe/step")
-def step_universe(req: StepRequest):
-    if req.session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    sim = sessions[req.session_id]["sim"]
-    for _ in range(req.steps):
-        sim.step()
-        
-    state = sim.get_state()
-    return {
-        "t": sim.t,
-        "positions": state["positions"].tolist()
-    }
+def step_universe(req: StepRequest, request: Request):
+    return step_session(req, request, "universe")
 
 # Algorithm Endpoints
 @app.post("/algorithms/create")
 def create_algo(req: CreateAlgoRequest):
-    session_id = str(uuid.uuid4())
-    if req.type == "bubble_sort":
-        gen = bubble_sort_steps(req.data)
-        sessions[session_id] = {"type": "algo", "gen": gen, "done": False}
-    elif req.type == "merge_sort":
-        gen = merge_sort_steps(req.data)
-        sessions[session_id] = {"type": "algo", "gen": gen, "done": False}
-    elif req.type == "quick_sort":
-        gen = quick_sort_steps(req.data)
-        sessions[session_id] = {"type": "algo", "gen": gen, "done": False}
-    else:
-        raise HTTPException(status_code=400, detail="Unknown algorithm")
-        
-    return {"session_id": session_id}
+    return create_session("algo", req)
 
 @app.post("/algorithms/step")
 def step_algo(req: StepRequest):
-    if req.session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    session = sessions[req.session_id]
-    if session["done"]:
-        return {"done": True}
-    
-    try:
+    session = get_session(req.session_id, "algo")
+    with session_lock(session):
         # Only step once for algorithms per request for now
-        state, indices, swapped = next(session["gen"])
-        return {
-            "done": False,
-            "data": state,
-            "indices": indices,
-            "swapped": swapped
+        kinds.advance(session, 1)
+        meta, _ = kinds.frame(session)
+    return meta
+
+# Snapshot Endpoints
+def _snapshot(session_id: str) -> Dict[str, Any]:
+    session = get_session(session_id)
+    try:
+        with session_lock(session):
+            if "remote" in session:
+                return session["remote"].snapshot(SNAPSHOT_DIR, session_id)
+            return snapshots.write_snapshot(session, SNAPSHOT_DIR, source=session_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _restore(snapshot_id: str, restore_rng: bool) -> str:
+    try:
+        manifest = snapshots.read_manifest(SNAPSHOT_DIR, snapshot_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    session_id = str(uuid.uuid4())
+    if SIM_WORKERS > 0:
+        session = get_workers().restore(session_id, manifest["type"], SNAPSHOT_DIR, snapshot_id, restore_rng)
+    else:
+        session = snapshots.load_snapshot(SNAPSHOT_DIR, snapshot_id, restore_rng)
+    sessions[session_id] = session
+    return session_id
+
+@app.post("/sim/{session_id}/snapshot")
+def snapshot_session(session_id: str):
+    manifest = _snapshot(session_id)
+    return {k: v for k, v in manifest.items() if k != "buffers"}
+
+@app.post("/sim/{session_id}/fork")
+def fork_session(session_id: str, req: RestoreRequest = RestoreRequest()):
+    """
+    Branch a session: snapshot it and restore the snapshot as a new session.
+    The snapshot is only a vehicle and is deleted again; the fork keeps its
+    copy-on-write mapping of the files until it goes away.
+    """
+    manifest = _snapshot(session_id)
+    try:
+        new_id = _restore(manifest["snapshot_id"], req.restore_rng)
+    finally:
+        snapshots.delete_snapshot(SNAPSHOT_DIR, manifest["snapshot_id"])
+    return {"session_id": new_id}
+
+@app.get("/snapshots")
+def list_snapshots():
+    return {"snapshots": snapshots.list_snapshots(SNAPSHOT_DIR)}
+
+@app.post("/snapshots/{snapshot_id}/restore")
+def restore_snapshot(snapshot_id: str, req: RestoreRequest = RestoreRequest()):
+    return {"session_id": _restore(snapshot_id, req.restore_rng)}
+
+@app.delete("/snapshots/{snapshot_id}")
+def delete_snapshot(snapshot_id: str):
+    try:
+        snapshots.delete_snapshot(SNAPSHOT_DIR, snapshot_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return {"status": "deleted"}
+
+# Recording Endpoints
+@app.post("/sim/{session_id}/record")
+def record_session(session_id: str, req: RecordRequest):
+    """Start (replacing any previous recording) or stop recording a session's frames."""
+    session = get_session(session_id)
+    with session_lock(session):
+        previous = session.get("recorder")
+        if not req.enabled:
+            if previous is None:
+                raise HTTPException(status_code=404, detail="Session is not being recorded")
+            previous.stop()
+            return previous.describe()
+        if previous is not None:
+            previous.delete()
+            del session["recorder"]
+        try:
+            recorder = FrameRecorder(os.path.join(RECORD_DIR, session_id), req.every,
+                                     req.chunk_frames, req.fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        try:
+            # The current frame is frame 0, so replays start where recording did
+            recorder.append(kinds.frame(session)[1])
+        except ValueError as e:
+            recorder.delete()
+            raise HTTPException(status_code=400, detail=str(e))
+        session["recorder"] = recorder
+        return recorder.describe()
+
+@app.get("/sim/{session_id}/frames")
+def read_frames(session_id: str, request: Request, start: Optional[int] = None, stop: Optional[int] = None,
+                stride: int = 1, fields: Optional[str] = None, precision: Optional[str] = None):
+    """
+    Recorded frames `start:stop:stride` (frame indices), each field stacked
+    along a new first axis, plus a `step` field with their step numbers.
+    """
+    session = get_session(session_id)
+    with session_lock(session):
+        recorder = session.get("recorder")
+        if recorder is None:
+            raise HTTPException(status_code=404, detail="Session is not being recorded")
+        meta = {"count": 0, "total": recorder.count, "every": recorder.every}
+        try:
+            steps, frames = recorder.read(start, stop, stride, fields.split(",") if fields else None)
+            if precision is not None:
+                precision_meta, frames = transport.quantize_fields(frames, precision)
+                meta.update(precision_meta)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        meta["count"] = len(steps)
+        return render_frame(request, meta, dict(frames, step=steps))
+
+# Job Endpoints
+# Long runs step on SIM_JOB_THREADS background threads (see jobs.py)
+# and keep at most SIM_JOB_SNAPSHOT_MB of snapshot frames (0: no limit)
+JOB_THREADS = int(os.environ.get("SIM_JOB_THREADS", 2))
+JOB_SNAPSHOT_MB = float(os.environ.get("SIM_JOB_SNAPSHOT_MB", 256))
+jobs = JobManager(
+    lock_for=session_lock,
+    alive=lambda session_id: sessions.get(session_id) is not None,
+    max_workers=JOB_THREADS,
+    max_snapshot_bytes=int(JOB_SNAPSHOT_MB * 1024 * 1024),
+)
+
+def get_job(job_id: str):
+    try:
+        return jobs.get(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+@app.post("/jobs")
+def submit_job(req: JobRequest):
+    session = get_session(req.session_id)
+    try:
+        job = jobs.submit(req.session_id, session, req.steps, req.snapshot_every)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job.status()
+
+@app.get("/jobs")
+def list_jobs():
+    return {"jobs": jobs.list()}
+
+@app.get("/jobs/{job_id}")
+def read_job(job_id: str):
+    return get_job(job_id).status()
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    get_job(job_id)
+    return jobs.cancel(job_id).status()
+
+@app.delete("/jobs/{job_id}")
+def delete_job(job_id: str):
+    get_job(job_id)
+    jobs.remove(job_id)
+    return {"status": "deleted"}
+
+@app.get("/jobs/{job_id}/snapshots/{index}")
+def read_job_snapshot(job_id: str, index: int, request: Request):
+    """
+    Frame copied after `step` steps of the job; index -1 is the latest.
+    Indices count every snapshot taken, including ones dropped to bound memory.
+    """
+    try:
+        step, meta, fields = jobs.snapshot(job_id, index)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    except IndexError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return render_frame(request, dict(meta, step=step), fields)
+
+# Batch Endpoints
+BATCH_THREADS = int(os.environ.get("SIM_BATCH_THREADS", os.cpu_count() or 1))
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_THREADS, thread_name_prefix="batch")
+
+# Errors a malformed entry (bad control message, unknown action) can raise
+_ENTRY_ERRORS = (ValueError, KeyError, TypeError, RuntimeError)
+
+def _step_group(entries: List[BatchStepEntry], group: List[Dict[str, Any]], binary: bool):
+    """
+    Step one group of sessions (stacked if the group has several) and
+    capture their frames. Returns one (frame, error) pair per entry: an
+    entry whose controls fail is left out of the stack and gets the error,
+    without affecting the others.
+    """
+    results: List[Any] = [None] * len(group)
+    with ExitStack() as stack:
+        # Lock in a fixed order so concurrent batches cannot deadlock
+        for entry, session in sorted(zip(entries, group), key=lambda pair: pair[0].session_id):
+            stack.enter_context(session_lock(session))
+        ready = []
+        for i, (entry, session) in enumerate(zip(entries, group)):
+            try:
+                for message in entry.controls:
+                    kinds.control(session, message)
+            except _ENTRY_ERRORS as e:
+                results[i] = (None, str(e))
+            else:
+                ready.append(i)
+        if not ready:
+            return results
+
+        try:
+            if len(ready) > 1:
+                kinds.advance_stacked([group[i] for i in ready], entries[ready[0]].steps)
+            else:
+                entry = entries[ready[0]]
+                kinds.advance(group[ready[0]], entry.steps, actions=entry.actions)
+        except _ENTRY_ERRORS as e:
+            for i in ready:
+                results[i] = (None, str(e))
+            return results
+
+        for i in ready:
+            meta, fields = kinds.frame(group[i])
+            if binary:
+                fields = {name: np.array(arr, copy=True) for name, arr in fields.items()}
+            else:
+                fields = transport.frame_to_json({}, fields)
+            results[i] = ((meta, fields), None)
+        return results
+
+@app.post("/sim/batch/step")
+def step_batch(req: BatchStepRequest, request: Request):
+    """
+    Advance many sessions in one call. Groups of same-kind, same-shape sessions
+    whose kernels support it (see KindHooks.stacked in kinds.py) are stepped together; all
+    other sessions are stepped in parallel on a thread pool. Failures are
+    reported per entry.
+    """
+    binary = transport.wants_binary(request.headers.get("accept", ""))
+    results: List[Optional[Dict[str, Any]]] = [None] * len(req.entries)
+    frames: Dict[int, Any] = {}
+    found: Dict[int, Dict[str, Any]] = {}
+    groups: Dict[Any, List[int]] = {}
+    seen = set()
+
+    for i, entry in enumerate(req.entries):
+        session = sessions.get(entry.session_id)
+        if session is None:
+            results[i] = {"session_id": entry.session_id, "error": "Session not found"}
+            continue
+        if entry.session_id in seen:
+            results[i] = {"session_id": entry.session_id, "error": "Duplicate session in batch"}
+            continue
+        seen.add(entry.session_id)
+        found[i] = session
+        key = kinds.stack_key(session, entry.steps) if entry.actions is None else None
+        groups.setdefault(key if key is not None else ("single", i), []).append(i)
+
+    futures = {}
+    for indices in groups.values():
+        group_entries = [req.entries[i] for i in indices]
+        group_sessions = [found[i] for i in indices]
+        futures[tuple(indices)] = _batch_executor.submit(_step_group, group_entries, group_sessions, binary)
+
+    for indices, future in futures.items():
+        for i, (frame, error) in zip(indices, future.result()):
+            if error is None:
+                frames[i] = frame
+            else:
+                results[i] = {"session_id": req.entries[i].session_id, "error": error}
+
+    for i in frames:
+        session_id = req.entries[i].session_id
+        meta, fields = frames[i]
+        results[i] = dict(meta, session_id=session_id, type=found[i]["type"])
+        if not binary:
+            results[i].update(fields)
+        sessions.refresh(session_id)
+
+    if binary:
+        # One frame for the whole batch: entry i's fields are named "i/<field>"
+        combined = {}
+        for i, (_, fields) in frames.items():
+            results[i]["fields"] = list(fields)
+            for name, arr in fields.items():
+                combined[f"{i}/{name}"] = arr
+        return Response(content=transport.encode_frame({"results": results}, combined),
+                        media_type=transport.FRAME_MEDIA_TYPE)
+    return {"results": results}
+
+# --- Streaming ---
+
+MAX_STREAM_FPS = 120.0
+
+def _parse_ints(value: Optional[str]) -> Optional[List[int]]:
+    return [int(v) for v in value.split(",")] if value else None
+
+def _check_ints(value: Any, name: str) -> Optional[List[int]]:
+    """A viewport/resolution from a JSON message: None or a list of integers."""
+    if value is not None and not (isinstance(value, list) and
+                                  all(isinstance(v, int) and not isinstance(v, bool) for v in value)):
+        raise ValueError(f"{name} must be a list of integers")
+    return value
+
+def _stream_tick(session, steps: int, view: Dict[str, Any], labels: Dict[str, str]):
+    with session_lock(session):
+        started = time.perf_counter() if metrics.enabled else 0.0
+        kinds.advance(session, steps)
+        meta, fields = kinds.frame(session)
+        if metrics.enabled:
+            # Streams report against the session's full grid, like the step endpoints
+            labels["grid"] = grid_label(fields)
+            metrics.record_step(labels["kind"], labels["grid"], steps, time.perf_counter() - started)
+        if view["viewport"] is not None or view["resolution"] is not None:
+            lod_meta, fields = reduce_fields(fields, view["viewport"], view["resolution"], view["mode"],
+                                             kinds.grid_shape(session, fields))
+            meta = dict(meta, lod=lod_meta)
+        # Copy so the frame can be serialized later without holding the lock
+        return meta, {name: np.array(arr, copy=True) for name, arr in fields.items()}
+
+def _stream_encode(meta, fields, binary: bool, encoder: Optional[DeltaEncoder], labels: Dict[str, str],
+                   precision: Optional[str] = None):
+    started = time.perf_counter() if metrics.enabled else 0.0
+    if encoder is not None:
+        # Every encoded frame reaches the client, so it always has the base
+        delta_meta, fields = encoder.encode(fields, since=encoder.seq)
+        meta = dict(meta, **delta_meta)
+    if precision is not None:
+        precision_meta, fields = transport.quantize_fields(fields, precision)
+        meta = dict(meta, **precision_meta)
+    if binary:
+        payload = transport.encode_frame(meta, fields)
+    else:
+        payload = json.dumps(transport.frame_to_json(meta, fields), default=transport.json_default)
+    if metrics.enabled:
+        metrics.record_frame(labels["kind"], labels["grid"], "binary" if binary else "json",
+                             time.perf_counter() - started, len(payload))
+    return payload
+
+def _stream_control(session, message: Dict[str, Any]):
+    with session_lock(session):
+        kinds.control(session, message)
+
+@app.websocket("/ws/sim/{session_id}")
+async def stream_session(websocket: WebSocket, session_id: str):
+    """
+    Advance a session on a server-side tick loop and push its frames.
+
+    Query params: `steps` (steps per frame), `fps` (target frame rate),
+    `format` ("json" or "binary", see transport.py), `delta=1` for
+    changed-cell frames (see delta.py), `viewport=x0,y0,x1,y1` /
+    `resolution=w,h` for a reduced region (see lod.py), and `precision`
+    (see transport.quantize_fields). Control messages are JSON:
+        {"type": "pause"} / {"type": "resume"}
+        {"type": "rate", "steps": 2, "fps": 30}
+        {"type": "view", "viewport": [0, 0, 256, 256], "resolution": [128, 128]}
+        {"type": "add_density", "x": 10, "y": 10, "amount": 5, "color": [1, 0, 0]}   (fluid)
+        {"type": "add_velocity", "x": 10, "y": 10, "u": 1.0, "v": 0.0}               (fluid)
+        {"type": "actions", "actions": {"nuke_poles": true}}                         (terraforming)
+
+    Only the newest frame is kept for sending: if the client reads slower than
+    the tick rate, intermediate frames are dropped (before being serialized)
+    instead of queued. The stream closes (code 4410) once the session is
+    deleted, expires or is evicted.
+    """
+    session = sessions.get(session_id)
+    if session is None:
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+
+    params = websocket.query_params
+    try:
+        steps = max(0, int(params.get("steps", 1)))
+        fps = min(MAX_STREAM_FPS, max(0.1, float(params.get("fps", 30))))
+        view = {
+            "viewport": _parse_ints(params.get("viewport")),
+            "resolution": _parse_ints(params.get("resolution")),
+            "mode": params.get("lod_mode", "mean"),
         }
-    except StopIteration:
-        session["done"] = True
-        return {"done": True}
+        reduce_fields({}, view["viewport"], view["resolution"], view["mode"])
+        precision = params.get("precision")
+        if precision is not None:
+            transport.check_precision(precision)
+    except ValueError:
+        await websocket.close(code=4400)
+        return
+    stream = {"steps": steps, "fps": fps, "dropped": 0}
+    binary = params.get("format") == "binary"
+    labels = {"kind": session["type"], "grid": "-"}
+    encoder = DeltaEncoder() if params.get("delta") in ("1", "true") else None
+    running = asyncio.Event()
+    running.set()
+    latest: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+    async def tick():
+        seq = 0
+        while True:
+            if sessions.peek(session_id) is not session:
+                # Deleted, expired or evicted: stop stepping it
+                await websocket.close(code=4410)
+                return
+            if not running.is_set():
+                # Paused; wake up now and then to notice removal
+                try:
+                    await asyncio.wait_for(running.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            started = time.monotonic()
+            seq += 1
+            meta, fields = await run_in_threadpool(_stream_tick, session, stream["steps"], dict(view), labels)
+            sessions.touch(session_id)
+            if latest.full():
+                latest.get_nowait()
+                stream["dropped"] += 1
+            latest.put_nowait((dict(meta, tick=seq, dropped=stream["dropped"]), fields))
+            await asyncio.sleep(max(0.0, 1.0 / stream["fps"] - (time.monotonic() - started)))
+
+    async def send():
+        while True:
+            meta, fields = await latest.get()
+            payload = await run_in_threadpool(_stream_encode, meta, fields, binary, encoder, labels, precision)
+            if binary:
+                await websocket.send_bytes(payload)
+            else:
+                await websocket.send_text(payload)
+
+    async def receive():
+        while True:
+            message = await websocket.receive_json()
+            action = message.get("type")
+            try:
+                if action == "pause":
+                    running.clear()
+                elif action == "resume":
+                    running.set()
+                elif action == "rate":
+                    if "steps" in message:
+                        stream["steps"] = max(0, int(message["steps"]))
+                    if "fps" in message:
+                        stream["fps"] = min(MAX_STREAM_FPS, max(0.1, float(message["fps"])))
+                elif action == "view":
+                    new_view = {
+                        "viewport": _check_ints(message.get("viewport"), "viewport"),
+                        "resolution": _check_ints(message.get("resolution"), "resolution"),
+                        "mode": message.get("mode", "mean"),
+                    }
+                    reduce_fields({}, new_view["viewport"], new_view["resolution"], new_view["mode"])
+                    view.update(new_view)
+                else:
+                    await run_in_threadpool(_stream_control, session, message)
+            except (ValueError, KeyError, TypeError) as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+
+    tasks = [asyncio.create_task(coro) for coro in (tick(), send(), receive())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if not isinstance(task.exception(), WebSocketDisconnect):
+                task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,116 @@
+"""
+Step latency instrumentation in Prometheus text format.
+
+Histograms are keyed by simulation kind and grid size (the shape of the
+frame's first field, e.g. "64x64"), so slow responses can be attributed to
+stepping, serialisation or payload size. Set SIM_METRICS=0 to disable
+recording; callers check `metrics.enabled` before taking timestamps, so a
+disabled registry costs one attribute lookup per request.
+"""
+import bisect
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SECONDS_BUCKETS = (1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(11)) # 1 KiB .. 1 GiB
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def grid_label(fields: Dict[str, np.ndarray]) -> str:
+    """Grid size label for a frame: the first field's shape, or "-" without fields."""
+    for arr in fields.values():
+        return "x".join(str(n) for n in np.shape(arr))
+    return "-"
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._series: Dict[Labels, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            snapshot = [(key, list(s[0]), s[1], s[2]) for key, s in sorted(self._series.items())]
+        for key, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield f"{self.name}_bucket{_format_labels(key, ('le', repr(float(bound))))} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {count}"
+            yield f"{self.name}_sum{_format_labels(key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(key)} {count}"
+
+
+class Metrics:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.step_seconds = Histogram(
+            "sim_step_seconds", "Time spent advancing a session per request.", SECONDS_BUCKETS)
+        self.per_step_seconds = Histogram(
+            "sim_per_step_seconds", "Time per simulation step (request step time / steps).", SECONDS_BUCKETS)
+        self.serialize_seconds = Histogram(
+            "sim_serialize_seconds", "Time spent turning a frame into a response body.", SECONDS_BUCKETS)
+        self.payload_bytes = Histogram(
+            "sim_payload_bytes", "Size of frame response bodies.", BYTES_BUCKETS)
+
+    def record_step(self, kind: str, grid: str, steps: int, step_seconds: float):
+        self.step_seconds.observe(step_seconds, kind=kind, grid=grid)
+        if steps > 0:
+            self.per_step_seconds.observe(step_seconds / steps, kind=kind, grid=grid)
+
+    def record_frame(self, kind: str, grid: str, fmt: str, serialize_seconds: float, nbytes: int):
+        self.serialize_seconds.observe(serialize_seconds, kind=kind, grid=grid, format=fmt)
+        self.payload_bytes.observe(nbytes, kind=kind, grid=grid, format=fmt)
+
+    def render(self, sessions: Iterable[Dict]) -> str:
+        """Prometheus text exposition, with live session gauges from `sessions` (store.describe())."""
+        lines = []
+        for histogram in (self.step_seconds, self.per_step_seconds, self.serialize_seconds, self.payload_bytes):
+            lines.extend(histogram.render())
+
+        counts: Dict[str, int] = {}
+        nbytes: Dict[str, int] = {}
+        for info in sessions:
+            kind = str(info.get("type"))
+            counts[kind] = counts.get(kind, 0) + 1
+            nbytes[kind] = nbytes.get(kind, 0) + info.get("nbytes", 0)
+        lines.append("# HELP sim_live_sessions Sessions currently held, by kind.")
+        lines.append("# TYPE sim_live_sessions gauge")
+        for kind in sorted(counts):
+            lines.append(f"sim_live_sessions{_format_labels((('kind', kind),))} {counts[kind]}")
+        lines.append("# HELP sim_session_bytes Estimated memory held by live sessions, by kind.")
+        lines.append("# TYPE sim_session_bytes gauge")
+        for kind in sorted(nbytes):
+            lines.append(f"sim_session_bytes{_format_labels((('kind', kind),))} {nbytes[kind]}")
+        return "\n".join(lines) + "\n"
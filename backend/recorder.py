@@ -0,0 +1,211 @@
+"""
+Append-only, memory-mapped frame recording.
+
+A FrameRecorder keeps every `every`-th frame of a session on disk so a run
+can be replayed or scrubbed without recomputing it. Frames are appended to
+fixed-size chunks, one `.npy` file per field per chunk:
+
+    recording.json            fields (dtype, shape), every, chunk_frames, count
+    step.00000.npy            (chunk_frames,) int64 step number of each frame
+    positions.00000.npy       (chunk_frames, n, 2)
+    positions.00001.npy       ...
+
+Chunks are created with np.lib.format.open_memmap, so each file is a plain
+.npy that np.load(..., mmap_mode="r") can open on its own, and range reads
+slice the mappings directly: only the requested frames are ever copied into
+memory. recording.json is rewritten whenever a chunk fills and on stop().
+
+Frames must keep the fields, dtypes and shapes of the first recorded frame.
+"""
+import json
+import os
+import shutil
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+STEP_FIELD = "step"
+_MANIFEST = "recording.json"
+
+
+class FrameRecorder:
+    def __init__(self, directory: str, every: int = 1, chunk_frames: int = 256,
+                 fields: Optional[Iterable[str]] = None, open_chunks: int = 8):
+        if every < 1:
+            raise ValueError("every must be a positive number of steps")
+        if chunk_frames < 1:
+            raise ValueError("chunk_frames must be positive")
+        self.directory = directory
+        self.every = every
+        self.chunk_frames = chunk_frames
+        self.names = list(fields) if fields is not None else None
+        self.layout: Dict[str, Tuple[str, Tuple[int, ...]]] = {}
+        self.count = 0
+        self.step = 0
+        self.active = True
+        self._open_chunks = open_chunks
+        self._writer: Dict[str, np.memmap] = {}
+        self._writer_chunk = -1
+        self._readers: "OrderedDict[int, Dict[str, np.ndarray]]" = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def open(cls, directory: str) -> "FrameRecorder":
+        """Open an existing recording for reading."""
+        with open(os.path.join(directory, _MANIFEST)) as f:
+            manifest = json.load(f)
+        recorder = cls(directory, manifest["every"], manifest["chunk_frames"], manifest["fields"])
+        recorder.layout = {name: (dtype, tuple(shape)) for name, (dtype, shape) in manifest["layout"].items()}
+        recorder.count = manifest["count"]
+        recorder.step = manifest["step"]
+        recorder.active = False
+        return recorder
+
+    # --- Writing ---
+
+    def steps_until_due(self) -> int:
+        """Steps to advance before the next frame should be recorded."""
+        return self.every - self.step % self.every
+
+    def advance(self, steps: int) -> bool:
+        """Count `steps` simulation steps; True if a frame is now due."""
+        self.step += steps
+        return self.step % self.every == 0
+
+    def append(self, fields: Dict[str, np.ndarray]):
+        """Record one frame at the current step."""
+        if self.names is not None:
+            missing = [name for name in self.names if name not in fields]
+            if missing:
+                raise ValueError(f"Frame has no field(s) {missing}")
+            fields = {name: fields[name] for name in self.names}
+        if not self.layout:
+            if not fields:
+                raise ValueError("Frame has no fields to record")
+            self.layout = {name: (np.asarray(arr).dtype.str, np.shape(arr)) for name, arr in fields.items()}
+            self.names = list(self.layout)
+        for name, (dtype, shape) in self.layout.items():
+            arr = fields[name]
+            if np.shape(arr) != shape or np.asarray(arr).dtype.str != dtype:
+                raise ValueError(f"Field '{name}' changed shape or dtype during recording")
+
+        chunk, row = divmod(self.count, self.chunk_frames)
+        if chunk != self._writer_chunk:
+            self._open_writer(chunk)
+        for name, arr in fields.items():
+            self._writer[name][row] = arr
+        self._writer[STEP_FIELD][row] = self.step
+        self.count += 1
+        if row == self.chunk_frames - 1:
+            self._close_writer()
+
+    def _path(self, name: str, chunk: int) -> str:
+        return os.path.join(self.directory, f"{name}.{chunk:05d}.npy")
+
+    def _open_writer(self, chunk: int):
+        self._close_writer()
+        layout = dict(self.layout, **{STEP_FIELD: ("<i8", ())})
+        self._writer = {
+            name: np.lib.format.open_memmap(self._path(name, chunk), mode="w+", dtype=np.dtype(dtype),
+                                            shape=(self.chunk_frames,) + tuple(shape))
+            for name, (dtype, shape) in layout.items()
+        }
+        self._writer_chunk = chunk
+
+    def _close_writer(self):
+        for arr in self._writer.values():
+            arr.flush()
+        self._writer = {}
+        self._writer_chunk = -1
+        self._write_manifest()
+
+    def _write_manifest(self):
+        manifest = {
+            "every": self.every,
+            "chunk_frames": self.chunk_frames,
+            "fields": self.names,
+            "layout": {name: [dtype, list(shape)] for name, (dtype, shape) in self.layout.items()},
+            "count": self.count,
+            "step": self.step,
+        }
+        path = os.path.join(self.directory, _MANIFEST)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(path + ".tmp", path)
+
+    def stop(self):
+        """Stop appending; recorded frames stay readable."""
+        self.active = False
+        self._close_writer()
+
+    def delete(self):
+        self._writer = {}
+        self._readers.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    # --- Reading ---
+
+    def _chunk(self, chunk: int) -> Dict[str, np.ndarray]:
+        if chunk == self._writer_chunk:
+            return self._writer
+        if chunk in self._readers:
+            self._readers.move_to_end(chunk)
+            return self._readers[chunk]
+        arrays = {name: np.load(self._path(name, chunk), mmap_mode="r")
+                  for name in list(self.layout) + [STEP_FIELD]}
+        self._readers[chunk] = arrays
+        while len(self._readers) > self._open_chunks:
+            self._readers.popitem(last=False)
+        return arrays
+
+    def read(self, start: Optional[int] = None, stop: Optional[int] = None, stride: int = 1,
+             names: Optional[Iterable[str]] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Recorded frames `start:stop:stride` (frame indices, as for a Python
+        slice) as (step numbers, {field: (frames, ...) array}).
+        """
+        if stride < 1:
+            raise ValueError("stride must be positive")
+        names = list(names) if names is not None else list(self.layout)
+        unknown = [name for name in names if name not in self.layout]
+        if unknown:
+            raise ValueError(f"Unknown field(s) {unknown}")
+        first, last, _ = slice(start, stop, stride).indices(self.count)
+
+        pieces: Dict[str, List[np.ndarray]] = {name: [] for name in names + [STEP_FIELD]}
+        index = first
+        while index < last:
+            chunk, row = divmod(index, self.chunk_frames)
+            end = min(last, (chunk + 1) * self.chunk_frames) - chunk * self.chunk_frames
+            arrays = self._chunk(chunk)
+            for name in pieces:
+                pieces[name].append(arrays[name][row:end:stride])
+            # First index in the next chunk that is on the stride
+            taken = -(-(end - row) // stride)
+            index += taken * stride
+
+        out = {}
+        for name, parts in pieces.items():
+            if len(parts) == 1:
+                out[name] = parts[0]
+            elif parts:
+                out[name] = np.concatenate(parts)
+            else:
+                dtype, shape = self.layout[name] if name != STEP_FIELD else ("<i8", ())
+                out[name] = np.empty((0,) + tuple(shape), dtype=np.dtype(dtype))
+        steps = out.pop(STEP_FIELD)
+        return steps, out
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "every": self.every,
+            "count": self.count,
+            "step": self.step,
+            "fields": {name: {"dtype": dtype, "shape": list(shape)} for name, (dtype, shape) in self.layout.items()},
+        }
+
+    def estimated_nbytes(self) -> int:
+        # Frames live in file-backed mappings, not session memory
+        return 0
@@ -0,0 +1,228 @@
+"""
+Bounded in-memory session storage.
+
+Sessions are plain dicts (see kinds.py). The store keeps them in LRU order,
+tracks an approximate byte footprint for each one (NumPy arrays, including
+the buffers behind scipy.sparse matrices and other simulation objects),
+expires sessions that have been idle for longer than `ttl` seconds, and
+evicts the least recently used sessions when the total exceeds `max_bytes`.
+Objects that hold memory elsewhere (e.g. a session in a worker process)
+report it through an `estimated_nbytes()` method. Objects with a true
+`shared` attribute (the cached, read-only physics operators) are not
+counted against any session; the store charges their memory once, through
+its `shared_nbytes` callback.
+"""
+import threading
+import time
+import types
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+_SKIP_TYPES = (str, bytes, int, float, bool, type(None), type, types.ModuleType,
+               types.FunctionType, types.BuiltinFunctionType, type(threading.Lock()))
+
+
+def estimate_nbytes(obj: Any, max_depth: int = 8) -> int:
+    """
+    Approximate memory held by an object graph: the sum of the distinct NumPy
+    buffers reachable through dicts, lists, tuples and object attributes.
+    Arrays that share a buffer (views) are counted once, and objects marked
+    `shared` not at all.
+    """
+    seen = set()
+    total = 0
+    stack = [(obj, 0)]
+    while stack:
+        item, depth = stack.pop()
+        if id(item) in seen or isinstance(item, _SKIP_TYPES) or depth > max_depth:
+            continue
+        if getattr(item, "shared", False) is True:
+            continue
+        seen.add(id(item))
+
+        if hasattr(item, "estimated_nbytes"):
+            total += item.estimated_nbytes()
+        elif isinstance(item, np.ndarray):
+            if item.base is None:
+                total += item.nbytes
+            else:
+                stack.append((item.base, depth))
+        elif isinstance(item, dict):
+            stack.extend((v, depth + 1) for v in item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend((v, depth + 1) for v in item)
+        elif hasattr(item, "__dict__"):
+            stack.extend((v, depth + 1) for v in vars(item).values())
+        elif isinstance(item, (memoryview, bytearray)):
+            total += item.nbytes if isinstance(item, memoryview) else len(item)
+    return total
+
+
+class SessionEntry:
+    __slots__ = ("session", "created", "last_access", "nbytes")
+
+    def __init__(self, session: Dict[str, Any], now: float):
+        self.session = session
+        self.created = now
+        self.last_access = now
+        self.nbytes = estimate_nbytes(session)
+
+
+class SessionStore(MutableMapping):
+    """
+    Dict-like session storage with TTL expiry and an LRU memory cap.
+    Reading a session (``store[id]``, ``store.get(id)``) counts as a use.
+    `ttl` and `max_bytes` of None disable the corresponding limit.
+    `on_remove(session_id, session)` is called, outside the store's lock, for
+    every session that is deleted, expired or evicted. `shared_nbytes()`
+    returns the memory held by objects shared between sessions, which counts
+    towards `max_bytes` once.
+    """
+    def __init__(self, ttl: Optional[float] = None, max_bytes: Optional[int] = None,
+                 clock=time.monotonic, on_remove=None, shared_nbytes=None):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.on_remove = on_remove
+        self.shared_nbytes = shared_nbytes
+        self._entries: "OrderedDict[str, SessionEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _notify(self, removed: List[Tuple[str, Dict[str, Any]]]):
+        if self.on_remove is not None:
+            for session_id, session in removed:
+                self.on_remove(session_id, session)
+
+    # --- Mapping interface ---
+    def __getitem__(self, session_id: str) -> Dict[str, Any]:
+        with self._lock:
+            removed = self._expire_locked()
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                entry.last_access = self.clock()
+                self._entries.move_to_end(session_id)
+        self._notify(removed)
+        if entry is None:
+            raise KeyError(session_id)
+        return entry.session
+
+    def __setitem__(self, session_id: str, session: Dict[str, Any]):
+        with self._lock:
+            previous = self._entries.get(session_id)
+            self._entries[session_id] = SessionEntry(session, self.clock())
+            self._entries.move_to_end(session_id)
+            removed = self._expire_locked() + self._enforce_memory_locked(keep=session_id)
+        if previous is not None and previous.session is not session:
+            removed.append((session_id, previous.session))
+        self._notify(removed)
+
+    def __delitem__(self, session_id: str):
+        with self._lock:
+            entry = self._entries.pop(session_id)
+        self._notify([(session_id, entry.session)])
+
+    def __contains__(self, session_id) -> bool:
+        with self._lock:
+            removed = self._expire_locked()
+            found = session_id in self._entries
+        self._notify(removed)
+        return found
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    # --- Bookkeeping ---
+    def touch(self, session_id: str):
+        """Mark a session as used without looking it up (e.g. from a stream)."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                entry.last_access = self.clock()
+                self._entries.move_to_end(session_id)
+
+    def peek(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Look a session up without counting it as a use or expiring anything."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            return entry.session if entry is not None else None
+
+    def refresh(self, session_id: str):
+        """Re-measure a session after it may have allocated, then apply the cap."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            entry.nbytes = estimate_nbytes(entry.session)
+            removed = self._enforce_memory_locked(keep=session_id)
+        self._notify(removed)
+
+    @property
+    def shared_bytes(self) -> int:
+        return self.shared_nbytes() if self.shared_nbytes is not None else 0
+
+    @property
+    def total_bytes(self) -> int:
+        """Session footprints plus the shared memory they use."""
+        with self._lock:
+            return sum(entry.nbytes for entry in self._entries.values()) + self.shared_bytes
+
+    def expire(self) -> List[str]:
+        """Drop sessions idle for longer than the TTL. Returns their ids."""
+        with self._lock:
+            removed = self._expire_locked()
+        self._notify(removed)
+        return [session_id for session_id, _ in removed]
+
+    def _expire_locked(self) -> List[Tuple[str, Dict[str, Any]]]:
+        if self.ttl is None:
+            return []
+        expired = []
+        now = self.clock()
+        # Entries are kept in LRU order, so stop at the first fresh one
+        for session_id, entry in list(self._entries.items()):
+            if now - entry.last_access <= self.ttl:
+                break
+            del self._entries[session_id]
+            expired.append((session_id, entry.session))
+        return expired
+
+    def _enforce_memory_locked(self, keep: Optional[str] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        if self.max_bytes is None:
+            return []
+        evicted = []
+        total = self.total_bytes
+        for session_id in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if session_id == keep:
+                continue
+            entry = self._entries.pop(session_id)
+            total -= entry.nbytes
+            evicted.append((session_id, entry.session))
+        return evicted
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """Per-session summary, least recently used first."""
+        with self._lock:
+            removed = self._expire_locked()
+            now = self.clock()
+            listing = [
+                {
+                    "session_id": session_id,
+                    "type": entry.session.get("type"),
+                    "nbytes": entry.nbytes,
+                    "age_seconds": now - entry.created,
+                    "idle_seconds": now - entry.last_access,
+                }
+                for session_id, entry in self._entries.items()
+            ]
+        self._notify(removed)
+        return listing
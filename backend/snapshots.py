@@ -0,0 +1,136 @@
+"""
+On-disk session snapshots.
+
+A snapshot is a directory holding:
+
+    manifest.json   kind, source session, creation time, buffer table
+    state.pkl       the session pickled with protocol 5, arrays out-of-band
+    buffers.bin     the raw array buffers, each aligned to 64 bytes
+
+Every NumPy buffer reachable from the session (fields, state vectors,
+velocities, terrain, the arrays inside scipy.sparse operators) goes to
+buffers.bin untouched. Restoring maps buffers.bin copy-on-write and hands
+slices of the mapping back to pickle, so arrays are paged in lazily and
+sessions restored from the same snapshot (forks) share every page they
+have not written to.
+
+The legacy global NumPy RNG state is stored too; it is only applied on
+restore when asked, since every session shares it.
+"""
+import json
+import mmap
+import os
+import pickle
+import re
+import shutil
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Session keys that hold per-connection or per-process state, not simulation state
+TRANSIENT_KEYS = {"lock", "delta", "recorder"}
+
+_ALIGN = 64
+_ID_PATTERN = re.compile(r"^[0-9a-f-]{36}$")
+
+
+def _snapshot_dir(root: str, snapshot_id: str) -> str:
+    if not _ID_PATTERN.match(snapshot_id):
+        raise KeyError(snapshot_id)
+    return os.path.join(root, snapshot_id)
+
+
+def write_snapshot(session: Dict[str, Any], root: str, source: Optional[str] = None) -> Dict[str, Any]:
+    """Write a session to a new snapshot under `root` and return its manifest."""
+    payload = {
+        "session": {k: v for k, v in session.items() if k not in TRANSIENT_KEYS},
+        "rng": np.random.get_state(),
+    }
+    buffers: List[pickle.PickleBuffer] = []
+    try:
+        state = pickle.dumps(payload, protocol=5, buffer_callback=buffers.append)
+    except (TypeError, AttributeError, pickle.PicklingError) as e:
+        raise ValueError(f"{session['type']} sessions cannot be snapshotted: {e}")
+
+    snapshot_id = str(uuid.uuid4())
+    os.makedirs(root, exist_ok=True)
+    staging = os.path.join(root, f".{snapshot_id}.tmp")
+    os.makedirs(staging)
+
+    table = []
+    offset = 0
+    with open(os.path.join(staging, "buffers.bin"), "wb") as f:
+        for buf in buffers:
+            raw = buf.raw()
+            pad = -offset % _ALIGN
+            f.write(b"\x00" * pad)
+            offset += pad
+            f.write(raw)
+            table.append([offset, raw.nbytes])
+            offset += raw.nbytes
+    with open(os.path.join(staging, "state.pkl"), "wb") as f:
+        f.write(state)
+
+    manifest = {
+        "snapshot_id": snapshot_id,
+        "type": session["type"],
+        "source_session": source,
+        "created": time.time(),
+        "nbytes": offset + len(state),
+        "buffers": table,
+    }
+    with open(os.path.join(staging, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    os.rename(staging, os.path.join(root, snapshot_id))
+    return manifest
+
+
+def read_manifest(root: str, snapshot_id: str) -> Dict[str, Any]:
+    path = os.path.join(_snapshot_dir(root, snapshot_id), "manifest.json")
+    if not os.path.exists(path):
+        raise KeyError(snapshot_id)
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_snapshot(root: str, snapshot_id: str, restore_rng: bool = False) -> Dict[str, Any]:
+    """Rebuild a session from a snapshot; arrays are copy-on-write views of the file."""
+    manifest = read_manifest(root, snapshot_id)
+    directory = _snapshot_dir(root, snapshot_id)
+
+    views = []
+    if manifest["buffers"]:
+        with open(os.path.join(directory, "buffers.bin"), "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        whole = memoryview(mapping)
+        views = [whole[offset:offset + nbytes] for offset, nbytes in manifest["buffers"]]
+
+    with open(os.path.join(directory, "state.pkl"), "rb") as f:
+        payload = pickle.loads(f.read(), buffers=views)
+
+    if restore_rng:
+        np.random.set_state(payload["rng"])
+    return payload["session"]
+
+
+def list_snapshots(root: str) -> List[Dict[str, Any]]:
+    if not os.path.isdir(root):
+        return []
+    manifests = []
+    for name in sorted(os.listdir(root)):
+        if _ID_PATTERN.match(name):
+            try:
+                manifest = read_manifest(root, name)
+            except (KeyError, ValueError):
+                continue
+            manifest.pop("buffers", None)
+            manifests.append(manifest)
+    return manifests
+
+
+def delete_snapshot(root: str, snapshot_id: str):
+    read_manifest(root, snapshot_id)
+    # Sessions restored from it keep their mappings; only the directory goes
+    shutil.rmtree(_snapshot_dir(root, snapshot_id))
@@ -0,0 +1,197 @@
+"""
+Wire formats for simulation frames.
+
+A frame is a dict of JSON-friendly metadata plus a dict of named NumPy arrays.
+By default frames are sent as JSON (arrays materialised with ``tolist()``);
+clients that send ``Accept: application/octet-stream`` get a framed binary
+payload instead, where each array's buffer is written out as-is:
+
+    b"SIMF" | uint32 header length (little-endian) | JSON header | arrays
+
+The JSON header looks like::
+
+    {"meta": {...}, "fields": [{"name": "density", "dtype": "<f8",
+                                "shape": [64, 64], "offset": 128, "nbytes": 32768}]}
+
+``offset`` is absolute from the start of the payload and every array starts on
+an 8-byte boundary, so browsers can wrap the buffers directly in typed arrays
+(``new Float64Array(buf, offset, nbytes / 8)``).
+
+Either format can carry floating-point fields at reduced precision (see
+:func:`quantize_fields`): cast to float32/float16, or linearly quantized to
+uint8/uint16 with a per-field ``offset`` and ``scale`` in the frame's
+``quantized`` meta entry, where ``value = offset + q * scale``.
+"""
+import json
+import struct
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+FRAME_MAGIC = b"SIMF"
+FRAME_MEDIA_TYPE = "application/octet-stream"
+BINARY_MEDIA_TYPES = (FRAME_MEDIA_TYPE, "application/x-sim-frame")
+_ALIGN = 8
+
+PRECISIONS = ("float64", "float32", "float16", "uint8", "uint16")
+
+
+def wants_binary(accept: str) -> bool:
+    """True if an ``Accept`` header asks for the binary frame format."""
+    if not accept:
+        return False
+    for part in accept.split(","):
+        media_type = part.split(";")[0].strip().lower()
+        if media_type in BINARY_MEDIA_TYPES:
+            return True
+    return False
+
+
+def json_default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _wire_array(arr: np.ndarray) -> np.ndarray:
+    """C-contiguous, little-endian view of an array (copies only if needed)."""
+    arr = np.asarray(arr)
+    if arr.dtype.byteorder == ">" or (arr.dtype.byteorder == "=" and not np.little_endian):
+        arr = arr.astype(arr.dtype.newbyteorder("<"))
+    return np.ascontiguousarray(arr)
+
+
+def _padding(size: int) -> int:
+    return -size % _ALIGN
+
+
+def encode_frame(meta: Dict[str, Any], fields: Dict[str, np.ndarray]) -> bytes:
+    """Pack metadata and arrays into a single binary frame."""
+    arrays = [(name, _wire_array(arr)) for name, arr in fields.items()]
+
+    # Offsets depend on the header length, and the header contains the
+    # offsets, so lay out the data section relative to zero first.
+    layout = []
+    cursor = 0
+    for name, arr in arrays:
+        layout.append({
+            "name": name,
+            "dtype": arr.dtype.str,
+            "shape": list(arr.shape),
+            "offset": cursor,
+            "nbytes": arr.nbytes,
+        })
+        cursor += arr.nbytes + _padding(arr.nbytes)
+
+    def build_header(base: int) -> bytes:
+        shifted = [dict(entry, offset=entry["offset"] + base) for entry in layout]
+        return json.dumps({"meta": meta, "fields": shifted}, default=json_default,
+                          separators=(",", ":")).encode("utf-8")
+
+    # Header length only grows with the base offset, so iterate to a fixed point.
+    base = 0
+    while True:
+        header = build_header(base)
+        prefix = len(FRAME_MAGIC) + 4 + len(header)
+        new_base = prefix + _padding(prefix)
+        if new_base == base:
+            break
+        base = new_base
+
+    chunks = [FRAME_MAGIC, struct.pack("<I", len(header)), header, b"\x00" * _padding(prefix)]
+    for _, arr in arrays:
+        chunks.append(memoryview(arr).cast("B"))
+        chunks.append(b"\x00" * _padding(arr.nbytes))
+    return b"".join(chunks)
+
+
+def decode_frame(payload: bytes) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """Inverse of :func:`encode_frame`. Arrays are read-only views into ``payload``."""
+    if payload[:len(FRAME_MAGIC)] != FRAME_MAGIC:
+        raise ValueError("Not a simulation frame")
+    (header_len,) = struct.unpack_from("<I", payload, len(FRAME_MAGIC))
+    start = len(FRAME_MAGIC) + 4
+    header = json.loads(bytes(payload[start:start + header_len]).decode("utf-8"))
+
+    fields = {}
+    for entry in header["fields"]:
+        dtype = np.dtype(entry["dtype"])
+        count = entry["nbytes"] // dtype.itemsize if dtype.itemsize else 0
+        arr = np.frombuffer(payload, dtype=dtype, count=count, offset=entry["offset"])
+        fields[entry["name"]] = arr.reshape(entry["shape"])
+    return header["meta"], fields
+
+
+def frame_to_json(meta: Dict[str, Any], fields: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """The default JSON shape: metadata keys alongside arrays as nested lists."""
+    body = dict(meta)
+    for name, arr in fields.items():
+        body[name] = np.asarray(arr).tolist()
+    return body
+
+
+def check_precision(precision: str):
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision must be one of {PRECISIONS}")
+
+
+def quantize_fields(fields: Dict[str, np.ndarray],
+                    precision: str) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Reduce the precision of the floating-point fields of a frame.
+    Returns (meta, fields); other fields pass through unchanged.
+
+    float32/float16 are plain casts (relative error about 6e-8 / 5e-4, and
+    float16 saturates beyond 65504). uint8/uint16 map each field's [min, max]
+    linearly onto the integer range, so the absolute error is at most
+    ``scale / 2``, i.e. (max - min) / 510 or (max - min) / 131070. Fields
+    with non-finite values are only cast to float32 for the integer modes.
+    """
+    check_precision(precision)
+    meta: Dict[str, Any] = {"precision": precision}
+    if precision == "float64":
+        return meta, fields
+
+    out = {}
+    quantized = {}
+    for name, arr in fields.items():
+        arr = np.asarray(arr)
+        if not np.issubdtype(arr.dtype, np.floating):
+            out[name] = arr
+            continue
+        if precision in ("float32", "float16"):
+            out[name] = arr.astype(precision)
+            continue
+
+        lo = float(arr.min()) if arr.size else 0.0
+        hi = float(arr.max()) if arr.size else 0.0
+        if not (np.isfinite(lo) and np.isfinite(hi)):
+            out[name] = arr.astype(np.float32)
+            continue
+        levels = np.iinfo(precision).max
+        scale = (hi - lo) / levels
+        if scale > 0:
+            q = np.rint((arr - lo) * (1.0 / scale))
+            np.clip(q, 0, levels, out=q)
+            out[name] = q.astype(precision)
+        else:
+            out[name] = np.zeros(arr.shape, dtype=precision)
+        quantized[name] = {"offset": lo, "scale": scale}
+
+    if quantized:
+        meta["quantized"] = quantized
+    return meta, out
+
+
+def dequantize_fields(meta: Dict[str, Any], fields: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Client-side inverse of :func:`quantize_fields` (float64 results)."""
+    quantized = meta.get("quantized", {})
+    out = {}
+    for name, arr in fields.items():
+        if name in quantized:
+            out[name] = quantized[name]["offset"] + np.asarray(arr, dtype=np.float64) * quantized[name]["scale"]
+        else:
+            out[name] = arr
+    return out
@@ -0,0 +1,260 @@
+"""
+Process-pool session workers.
+
+With SIM_WORKERS=N the API process only routes requests: each session is
+created inside one of N worker processes and stays pinned there, so heavy
+steps on different sessions run on different cores instead of contending
+for one GIL. After every step the worker copies the session's frame fields
+into multiprocessing.shared_memory blocks; the API process maps the same
+blocks and reads frames from them directly, so arrays are never pickled.
+
+The API side only sees a RemoteSession handle stored under the session's
+"remote" key; kinds.advance/frame/control forward to it.
+"""
+import atexit
+import multiprocessing as mp
+import threading
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import kinds
+import snapshots
+from session_store import estimate_nbytes
+
+# (name, shared memory block name, dtype str, shape)
+FieldLayout = Tuple[str, str, str, Tuple[int, ...]]
+
+
+def _release(block: shared_memory.SharedMemory, unlink: bool = False):
+    try:
+        block.close()
+    except BufferError:
+        # A frame view is still alive somewhere; the mapping goes with it
+        pass
+    if unlink:
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# --- Worker process side ---
+
+class _SharedFields:
+    """Shared memory blocks holding one session's latest frame."""
+    def __init__(self):
+        self.blocks: Dict[str, shared_memory.SharedMemory] = {}
+        self.sizes: Dict[str, int] = {}
+
+    def publish(self, fields: Dict[str, np.ndarray]) -> List[FieldLayout]:
+        layout = []
+        for name, arr in fields.items():
+            arr = np.ascontiguousarray(arr)
+            block = self.blocks.get(name)
+            if block is None or self.sizes[name] != arr.nbytes:
+                if block is not None:
+                    _release(block, unlink=True)
+                block = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+                self.blocks[name] = block
+                self.sizes[name] = arr.nbytes
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=block.buf)[...] = arr
+            layout.append((name, block.name, arr.dtype.str, arr.shape))
+
+        for name in [n for n in self.blocks if n not in fields]:
+            _release(self.blocks.pop(name), unlink=True)
+            del self.sizes[name]
+        return layout
+
+    def close(self):
+        for block in self.blocks.values():
+            _release(block, unlink=True)
+        self.blocks.clear()
+        self.sizes.clear()
+
+
+def _worker_main(conn):
+    sessions: Dict[str, Dict[str, Any]] = {}
+    shared: Dict[str, _SharedFields] = {}
+
+    def publish(session_id):
+        meta, fields = kinds.frame(sessions[session_id])
+        layout = shared[session_id].publish(fields)
+        return meta, layout, estimate_nbytes(sessions[session_id])
+
+    while True:
+        try:
+            command, session_id, args = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if command == "stop":
+            break
+        try:
+            if command == "create":
+                kind, params = args
+                sessions[session_id] = kinds.create(kind, params)
+                shared[session_id] = _SharedFields()
+                result = publish(session_id)
+            elif command == "step":
+                steps, actions = args
+                kinds.advance(sessions[session_id], steps, actions)
+                result = publish(session_id)
+            elif command == "advance_to":
+                t_end, options = args
+                stats = kinds.advance_to(sessions[session_id], t_end, options)
+                result = (stats, publish(session_id))
+            elif command == "control":
+                kinds.control(sessions[session_id], args)
+                result = publish(session_id)
+            elif command == "restore":
+                root, snapshot_id, restore_rng = args
+                sessions[session_id] = snapshots.load_snapshot(root, snapshot_id, restore_rng)
+                shared[session_id] = _SharedFields()
+                result = publish(session_id)
+            elif command == "snapshot":
+                root, source = args
+                result = snapshots.write_snapshot(sessions[session_id], root, source)
+            elif command == "delete":
+                sessions.pop(session_id, None)
+                fields = shared.pop(session_id, None)
+                if fields is not None:
+                    fields.close()
+                result = None
+            else:
+                raise ValueError(f"Unknown worker command '{command}'")
+            conn.send(("ok", result))
+        except Exception as e:
+            conn.send(("error", type(e).__name__, str(e)))
+
+    for fields in shared.values():
+        fields.close()
+    conn.close()
+
+
+# --- API process side ---
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        # One request in flight per worker; the worker handles them in order
+        self.lock = threading.Lock()
+        self.num_sessions = 0
+
+    def call(self, command: str, session_id: str, args: Any = None):
+        with self.lock:
+            try:
+                self.conn.send((command, session_id, args))
+                reply = self.conn.recv()
+            except (EOFError, BrokenPipeError, OSError):
+                raise RuntimeError("Session worker is not running")
+        if reply[0] == "error":
+            _, name, message = reply
+            raise (ValueError if name in ("ValueError", "KeyError") else RuntimeError)(message)
+        return reply[1]
+
+
+class RemoteSession:
+    """Handle for a session that lives in a worker process."""
+    def __init__(self, pool: "WorkerPool", worker: _Worker, session_id: str):
+        self.pool = pool
+        self.worker = worker
+        self.session_id = session_id
+        self.meta: Dict[str, Any] = {}
+        self.nbytes = 0
+        self._layout: List[FieldLayout] = []
+        self._blocks: Dict[str, shared_memory.SharedMemory] = {}
+
+    def _update(self, reply):
+        self.meta, self._layout, self.nbytes = reply
+        live = set()
+        for _, block_name, _, _ in self._layout:
+            live.add(block_name)
+            if block_name not in self._blocks:
+                self._blocks[block_name] = shared_memory.SharedMemory(name=block_name)
+        for block_name in [b for b in self._blocks if b not in live]:
+            _release(self._blocks.pop(block_name))
+
+    def advance(self, steps: int, actions: Optional[Dict[str, bool]] = None):
+        self._update(self.worker.call("step", self.session_id, (steps, actions)))
+
+    def advance_to(self, t_end: float, options: Dict[str, Any]) -> Dict[str, Any]:
+        stats, reply = self.worker.call("advance_to", self.session_id, (t_end, options))
+        self._update(reply)
+        return stats
+
+    def control(self, message: Dict[str, Any]):
+        self._update(self.worker.call("control", self.session_id, message))
+
+    def snapshot(self, root: str, source: Optional[str] = None) -> Dict[str, Any]:
+        return self.worker.call("snapshot", self.session_id, (root, source))
+
+    def frame(self):
+        """Latest frame; the arrays are views straight onto shared memory."""
+        fields = {}
+        for name, block_name, dtype, shape in self._layout:
+            fields[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=self._blocks[block_name].buf)
+        return dict(self.meta), fields
+
+    def estimated_nbytes(self) -> int:
+        return self.nbytes
+
+    def close(self):
+        for block in self._blocks.values():
+            _release(block)
+        self._blocks.clear()
+        self._layout = []
+        try:
+            self.worker.call("delete", self.session_id)
+        except RuntimeError:
+            pass
+        self.pool._release(self.worker)
+
+
+class WorkerPool:
+    def __init__(self, num_workers: int):
+        ctx = mp.get_context("spawn")
+        self.workers = [_Worker(ctx) for _ in range(num_workers)]
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def _place(self, session_id: str, kind: str, command: str, args: Any) -> Dict[str, Any]:
+        with self._lock:
+            worker = min(self.workers, key=lambda w: w.num_sessions)
+            worker.num_sessions += 1
+        remote = RemoteSession(self, worker, session_id)
+        try:
+            remote._update(worker.call(command, session_id, args))
+        except Exception:
+            self._release(worker)
+            raise
+        return {"type": kind, "remote": remote}
+
+    def _release(self, worker: _Worker):
+        with self._lock:
+            worker.num_sessions -= 1
+
+    def create(self, session_id: str, kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a session on the least loaded worker and return its session dict."""
+        return self._place(session_id, kind, "create", (kind, params))
+
+    def restore(self, session_id: str, kind: str, root: str, snapshot_id: str,
+                restore_rng: bool = False) -> Dict[str, Any]:
+        """Load a snapshot into a new session on the least loaded worker."""
+        return self._place(session_id, kind, "restore", (root, snapshot_id, restore_rng))
+
+    def shutdown(self):
+        for worker in self.workers:
+            try:
+                with worker.lock:
+                    worker.conn.send(("stop", None, None))
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self.workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        self.workers = []
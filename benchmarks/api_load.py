@@ -0,0 +1,247 @@
+"""
+HTTP load test for the simulation API.
+
+Drives a reproducible mix of create/step traffic across simulation kinds and
+grid sizes at one or more concurrency levels, and prints a JSON report
+(throughput, latency percentiles and payload sizes per operation, kind and
+grid size) so runs can be compared across commits.
+
+By default the backend app is started in-process on a local uvicorn server;
+pass --url to load an already running instance instead.
+
+    python benchmarks/api_load.py --concurrency 1,4,16 --grids 32,128 --requests 50
+    python benchmarks/api_load.py --url http://localhost:8000 --kinds fluid,automata --binary -o fluid.json
+
+Each client thread keeps one keep-alive connection. For every request it
+draws a kind and grid size from a seeded RNG, creates a session for that
+combination the first time (and again with probability --create-ratio), and
+otherwise steps one of its sessions by --steps steps.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT, 'backend'))
+
+# kind -> (create path, step path, create body for a grid size)
+KINDS = {
+    "physics": ("/sim/physics/create", "/sim/physics/step", lambda n: {"nx": n, "ny": n}),
+    "mars": ("/sim/mars/create", "/sim/mars/step", lambda n: {"nx": n, "ny": n}),
+    "venus": ("/sim/venus/create", "/sim/venus/step", lambda n: {"nx": n, "ny": n}),
+    "volcano": ("/sim/volcano/create", "/sim/volcano/step", lambda n: {"nx": n, "ny": n}),
+    "automata": ("/sim/automata/create", "/sim/automata/step", lambda n: {"nx": n, "ny": n}),
+    "fluid": ("/sim/fluid/create", "/sim/fluid/step", lambda n: {"nx": n, "ny": n}),
+    "universe": ("/sim/universe/create", "/sim/universe/step", lambda n: {"num_bodies": n}),
+    "terraform": ("/sim/terraforming/create", "/sim/terraforming/step", lambda n: {}),
+    "algo": ("/algorithms/create", "/algorithms/step", lambda n: {"data": list(range(n, 0, -1))}),
+}
+
+
+def start_server() -> Tuple[str, Any]:
+    """Run backend/main.py's app on a free local port in a background thread."""
+    import uvicorn
+    import main
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn failed to start")
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}", server
+
+
+class Client:
+    def __init__(self, url: str, binary: bool):
+        parsed = urlparse(url)
+        self.conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=300)
+        self.headers = {"Content-Type": "application/json"}
+        if binary:
+            self.headers["Accept"] = "application/octet-stream"
+
+    def post(self, path: str, body: Dict[str, Any]) -> Tuple[int, bytes]:
+        self.conn.request("POST", path, body=json.dumps(body), headers=self.headers)
+        response = self.conn.getresponse()
+        return response.status, response.read()
+
+    def close(self):
+        self.conn.close()
+
+
+def step_body(kind: str, session_id: str, steps: int) -> Dict[str, Any]:
+    if kind == "terraform":
+        return {"session_id": session_id, "actions": {}}
+    return {"session_id": session_id, "steps": steps}
+
+
+def run_client(url: str, seed: int, args, samples: List[Tuple[str, str, int, float, int, bool]]):
+    rng = random.Random(seed)
+    client = Client(url, args.binary)
+    owned: Dict[Tuple[str, int], List[str]] = {}
+    try:
+        for _ in range(args.requests):
+            kind = rng.choice(args.kinds)
+            grid = rng.choice(args.grids) if kind != "terraform" else 0
+            create_path, step_path, create_body = KINDS[kind]
+            ids = owned.setdefault((kind, grid), [])
+
+            if not ids or rng.random() < args.create_ratio:
+                op, path, body = "create", create_path, create_body(grid)
+            else:
+                op, path, body = "step", step_path, step_body(kind, rng.choice(ids), args.steps)
+
+            started = time.perf_counter()
+            try:
+                status, payload = client.post(path, body)
+            except (OSError, http.client.HTTPException):
+                client.close()
+                client = Client(url, args.binary)
+                status, payload = 0, b""
+            elapsed = time.perf_counter() - started
+
+            ok = status == 200
+            if ok and op == "create":
+                ids.append(json.loads(payload)["session_id"])
+            samples.append((op, kind, grid, elapsed, len(payload), ok))
+    finally:
+        client.close()
+
+
+def summarize(samples, wall: float) -> Dict[str, Any]:
+    groups: Dict[Tuple[str, str, int], List] = {}
+    for op, kind, grid, elapsed, nbytes, ok in samples:
+        groups.setdefault((op, kind, grid), []).append((elapsed, nbytes, ok))
+
+    def stats(rows):
+        latency = np.array([r[0] for r in rows if r[2]]) * 1000.0
+        nbytes = np.array([r[1] for r in rows if r[2]])
+        out = {"requests": len(rows), "errors": sum(1 for r in rows if not r[2])}
+        if len(latency):
+            out["latency_ms"] = {
+                "mean": float(latency.mean()),
+                "p50": float(np.percentile(latency, 50)),
+                "p90": float(np.percentile(latency, 90)),
+                "p99": float(np.percentile(latency, 99)),
+                "max": float(latency.max()),
+            }
+            out["payload_bytes"] = {"mean": float(nbytes.mean()), "max": int(nbytes.max())}
+        return out
+
+    all_rows = [(s[3], s[4], s[5]) for s in samples]
+    return {
+        "wall_seconds": wall,
+        "throughput_rps": len(samples) / wall if wall > 0 else None,
+        "overall": stats(all_rows),
+        "by_operation": [
+            dict(operation=op, kind=kind, grid=grid, **stats(rows))
+            for (op, kind, grid), rows in sorted(groups.items())
+        ],
+    }
+
+
+def run_level(url: str, concurrency: int, args) -> Dict[str, Any]:
+    samples: List = []
+    threads = [
+        threading.Thread(target=run_client, args=(url, args.seed * 1000 + i, args, samples))
+        for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return dict(concurrency=concurrency, **summarize(samples, time.perf_counter() - started))
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="load a running server instead of starting one in-process")
+    parser.add_argument("--concurrency", type=parse_ints, default=[1, 4, 16],
+                        help="comma-separated client counts, one run each")
+    parser.add_argument("--kinds", default=",".join(KINDS), help="comma-separated simulation kinds")
+    parser.add_argument("--grids", type=parse_ints, default=[32, 64, 128],
+                        help="grid sizes (bodies for universe, array length for algo)")
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    parser.add_argument("--steps", type=int, default=1, help="steps per step request")
+    parser.add_argument("--create-ratio", type=float, default=0.05,
+                        help="chance that a request creates a fresh session")
+    parser.add_argument("--binary", action="store_true", help="request binary frames")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    args.kinds = [k for k in args.kinds.split(",") if k]
+    unknown = [k for k in args.kinds if k not in KINDS]
+    if unknown:
+        parser.error(f"unknown kinds {unknown}; choose from {list(KINDS)}")
+
+    server = None
+    url = args.url
+    if url is None:
+        url, server = start_server()
+
+    try:
+        levels = [run_level(url, concurrency, args) for concurrency in args.concurrency]
+    finally:
+        if server is not None:
+            server.should_exit = True
+
+    report = {
+        "config": {
+            "url": args.url or "in-process",
+            "kinds": args.kinds,
+            "grids": args.grids,
+            "requests_per_client": args.requests,
+            "steps": args.steps,
+            "create_ratio": args.create_ratio,
+            "binary": args.binary,
+            "seed": args.seed,
+        },
+        "environment": {
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "env": {k: v for k, v in os.environ.items() if k.startswith("SIM_")},
+        },
+        "levels": levels,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
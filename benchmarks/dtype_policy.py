@@ -0,0 +1,116 @@
+"""
+Session memory and numerical drift of float32 vs float64 fields.
+
+For each simulation kind that takes a `dtype`, creates the same session
+(same seed, same injections) once with float64 and once with float32
+fields, steps both, and reports the estimated session footprint
+(session_store.estimate_nbytes), the memory ratio, and the largest
+difference between the two runs' fields relative to the float64 field's
+largest magnitude. Automata boards are uint8 regardless of dtype, so
+they are reported once, in bytes per cell. Prints JSON.
+
+    python benchmarks/dtype_policy.py --size 256 --steps 50 --check
+
+--check exits 1 if any float32 field drifts from its float64 twin by more
+than --max-drift (relative), so it can guard the float32 mode in CI.
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.append(BACKEND)
+
+import kinds
+from session_store import estimate_nbytes
+
+
+def cases(n: int):
+    # A stable explicit step for the 5-point Laplacian on the unit square
+    dt = 0.2 / (n * n * 0.1)
+    return [
+        ("diffusion/stencil/euler", "physics", {"nx": n, "ny": n, "dt": dt, "operator": "stencil"}),
+        ("diffusion/spectral/exact", "physics", {"nx": n, "ny": n, "dt": dt, "operator": "spectral"}),
+        ("diffusion/csr/crank_nicolson", "physics", {"nx": n, "ny": n, "dt": 10 * dt,
+                                                     "integrator": "crank_nicolson"}),
+        ("wave/stencil/verlet", "physics", {"type": "wave", "nx": n, "ny": n, "dt": 0.2 / n, "param": 1.0,
+                                           "operator": "stencil", "fast_forward": False}),
+        ("fluid", "fluid", {"nx": n, "ny": n}),
+        ("fluid/projection", "fluid", {"nx": n, "ny": n, "projection": True}),
+        ("volcano", "volcano", {"nx": min(n, 64), "ny": min(n, 64)}),
+        ("venus", "venus", {"nx": n, "ny": n}),
+        ("mars", "mars", {"nx": n, "ny": n}),
+    ]
+
+
+def stir(session, n: int):
+    # Fluid sessions start at rest: inject a plume so advection has work to do
+    if session["type"] != "fluid":
+        return
+    c = n // 2
+    for i in range(c - 2, c + 3):
+        kinds.control(session, {"type": "add_density", "x": i, "y": c, "amount": 10.0})
+        kinds.control(session, {"type": "add_velocity", "x": i, "y": c, "u": 5.0, "v": 3.0})
+
+
+def run_case(kind: str, params: dict, n: int, steps: int, dtype: str):
+    np.random.seed(0)
+    session = kinds.create(kind, dict(params, dtype=dtype))
+    stir(session, n)
+    for _ in range(steps):
+        kinds.advance(session, 1)
+    _, fields = kinds.frame(session)
+    fields = {name: np.array(arr, dtype=np.float64) for name, arr in fields.items()
+              if isinstance(arr, np.ndarray) and arr.ndim == 2}
+    return estimate_nbytes(session), fields
+
+
+def compare(name: str, kind: str, params: dict, n: int, steps: int):
+    bytes64, fields64 = run_case(kind, params, n, steps, "float64")
+    bytes32, fields32 = run_case(kind, params, n, steps, "float32")
+    drift = {}
+    for field, ref in fields64.items():
+        scale = float(np.abs(ref).max()) or 1.0
+        drift[field] = float(np.abs(fields32[field] - ref).max()) / scale
+    return {
+        "case": name,
+        "grid": [params["nx"], params["ny"]],
+        "steps": steps,
+        "bytes_float64": bytes64,
+        "bytes_float32": bytes32,
+        "memory_ratio": bytes64 / bytes32 if bytes32 else None,
+        "relative_drift": drift,
+    }
+
+
+def automata(n: int):
+    np.random.seed(0)
+    session = kinds.create("automata", {"nx": n, "ny": n})
+    board = session["sim"].grid
+    return {"grid": [n, n], "dtype": str(board.dtype), "bytes": estimate_nbytes(session),
+            "bytes_per_cell": estimate_nbytes(session) / board.size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=256)
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--max-drift", type=float, default=1e-3)
+    parser.add_argument("--check", action="store_true",
+                        help="exit 1 if any float32 field drifts more than --max-drift")
+    args = parser.parse_args()
+
+    results = [compare(name, kind, params, args.size, args.steps) for name, kind, params in cases(args.size)]
+    failures = [(r["case"], field) for r in results
+                for field, drift in r["relative_drift"].items() if drift > args.max_drift]
+    print(json.dumps({"numpy": np.__version__, "results": results, "automata": automata(args.size),
+                      "max_drift": args.max_drift, "failures": failures}, indent=2))
+    if args.check and failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
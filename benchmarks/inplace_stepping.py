@@ -0,0 +1,102 @@
+"""
+Allocating vs in-place time stepping.
+
+For each grid size, integrator and operator backend, runs the physics
+environment's steps both ways: "allocating" calls Integrator.step() and
+wraps the result in a new StateVector (the old step path), "inplace"
+calls SimulationEnvironment.step(), which updates the state through
+Integrator.step_inplace(). Reports steps/sec and the peak memory
+allocated during stepping beyond the state itself (tracemalloc, measured
+in a separate run so tracing does not skew the timings), and the largest
+difference between the two final states. Prints JSON.
+
+    python benchmarks/inplace_stepping.py --sizes 256,1024,2048 --steps 20
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from simulations.physics_engine.core.integrator import get_integrator
+from simulations.physics_engine.core.state import StateVector
+from simulations.physics_engine.env.environment import SimulationEnvironment
+from simulations.physics_engine.grid.grid2d import Grid2D
+from simulations.physics_engine.models.diffusion import DiffusionModel
+
+
+def make_env(n: int, integrator: str, backend: str) -> SimulationEnvironment:
+    grid = Grid2D(n, n)
+    operator = DiffusionModel(grid, 0.1, backend=backend).get_operator()
+    # Stable explicit step for the 5-point Laplacian
+    dt = 0.2 * grid.dx * grid.dy / 0.1
+    env = SimulationEnvironment(n, n, dt, operator, get_integrator(integrator))
+    env.set_state(np.random.default_rng(0).random((n, n)))
+    return env
+
+
+def step_allocating(env: SimulationEnvironment):
+    new_data = env.integrator.step(env.state.data, env.operator, env.dt)
+    env.state = StateVector(new_data, env.state.shape)
+    env.t += env.dt
+
+
+def step_inplace(env: SimulationEnvironment):
+    env.step()
+
+
+def measure(n: int, integrator: str, backend: str, step, steps: int):
+    env = make_env(n, integrator, backend)
+    step(env) # warm up: workspace buffers, CSR matrix
+    started = time.perf_counter()
+    for _ in range(steps):
+        step(env)
+    elapsed = time.perf_counter() - started
+
+    traced = make_env(n, integrator, backend)
+    step(traced)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for _ in range(min(steps, 3)):
+        step(traced)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return env.state.data, {"steps_per_second": steps / elapsed, "peak_bytes": peak}
+
+
+def run(n: int, integrator: str, backend: str, steps: int):
+    before, allocating = measure(n, integrator, backend, step_allocating, steps)
+    after, inplace = measure(n, integrator, backend, step_inplace, steps)
+    return {
+        "grid": [n, n],
+        "integrator": integrator,
+        "operator": backend,
+        "state_bytes": n * n * 8,
+        "allocating": allocating,
+        "inplace": inplace,
+        "speedup": inplace["steps_per_second"] / allocating["steps_per_second"],
+        "max_difference": float(np.abs(before - after).max()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="256,1024,2048")
+    parser.add_argument("--integrators", default="euler,rk4")
+    parser.add_argument("--operators", default="csr,stencil")
+    parser.add_argument("--steps", type=int, default=20)
+    args = parser.parse_args()
+    results = [run(int(n), integrator, backend, args.steps)
+               for n in args.sizes.split(",")
+               for integrator in args.integrators.split(",")
+               for backend in args.operators.split(",")]
+    print(json.dumps({"numpy": np.__version__, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
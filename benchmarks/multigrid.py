@@ -0,0 +1,86 @@
+"""
+Multigrid Poisson/Helmholtz solver scaling.
+
+For each grid size, boundary and cycle type, solves a random right-hand
+side to a relative residual of --rtol and reports the cycle count, the
+average reduction of the residual per cycle and seconds per cycle and per
+million cells (roughly constant when the cost is O(n)). Also times one
+backward Euler diffusion step on the "stencil" operator, where multigrid
+preconditions conjugate gradients. Prints JSON.
+
+    python benchmarks/multigrid.py --sizes 128,512,2048 --cycles V,W,F
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from simulations.physics_engine.core.integrator import BackwardEuler
+from simulations.physics_engine.grid.grid2d import Grid2D
+from simulations.physics_engine.models.diffusion import DiffusionModel
+from simulations.physics_engine.solvers.multigrid import MultigridSolver
+
+
+def run_solve(n: int, boundary: str, cycle: str, rtol: float):
+    grid = Grid2D(n, n)
+    started = time.perf_counter()
+    solver = MultigridSolver.for_grid(grid, boundary=boundary, cycle=cycle)
+    setup = time.perf_counter() - started
+    rhs = np.random.default_rng(0).random(grid.shape)
+
+    started = time.perf_counter()
+    _, info = solver.solve(rhs, rtol=rtol)
+    elapsed = time.perf_counter() - started
+    cycles = max(info["iterations"], 1)
+    per_cycle = elapsed / cycles
+    return {
+        "grid": [n, n],
+        "boundary": boundary,
+        "cycle": cycle,
+        "levels": len(solver.levels),
+        "setup_seconds": setup,
+        "cycles": info["iterations"],
+        "converged": info["converged"],
+        "reduction_per_cycle": (info["residual"] / np.linalg.norm(rhs - (rhs.mean() if solver.singular else 0))) ** (1 / cycles),
+        "seconds": elapsed,
+        "seconds_per_cycle": per_cycle,
+        "seconds_per_cycle_per_mcell": per_cycle / (n * n / 1e6),
+    }
+
+
+def run_implicit(n: int):
+    grid = Grid2D(n, n)
+    operator = DiffusionModel(grid, 0.1, backend="stencil").get_operator()
+    state = np.random.default_rng(0).random(n * n)
+    integrator = BackwardEuler(direct_limit=0)
+    started = time.perf_counter()
+    integrator.step(state, operator, 1e-3)
+    first = time.perf_counter() - started
+    started = time.perf_counter()
+    integrator.step(state, operator, 1e-3)
+    return {"grid": [n, n], "first_step_seconds": first, "step_seconds": time.perf_counter() - started}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="128,512,2048")
+    parser.add_argument("--boundaries", default="dirichlet,neumann,periodic")
+    parser.add_argument("--cycles", default="V,W,F")
+    parser.add_argument("--rtol", type=float, default=1e-8)
+    args = parser.parse_args()
+    sizes = [int(n) for n in args.sizes.split(",")]
+    solves = [run_solve(n, boundary, cycle, args.rtol)
+              for n in sizes
+              for boundary in args.boundaries.split(",")
+              for cycle in args.cycles.split(",")]
+    implicit = [run_implicit(n) for n in sizes]
+    print(json.dumps({"numpy": np.__version__, "solves": solves, "backward_euler": implicit}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
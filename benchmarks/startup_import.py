@@ -0,0 +1,103 @@
+"""
+Backend cold-start benchmark.
+
+Measures, in fresh interpreters, how long `import main` takes (what a new
+API process or worker pays before it can serve), which heavy packages that
+import pulls in, and what each simulation kind costs on its first create
+once the registry in backend/kinds.py imports its module. Prints JSON.
+
+    python benchmarks/startup_import.py --repeat 5
+    python benchmarks/startup_import.py --check     # exit 1 if simulations or scipy load eagerly
+
+--check is meant for CI: the API must be able to start without importing
+any simulation module.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BACKEND = os.path.join(ROOT, 'backend')
+
+# Packages that must not be imported until a session of some kind is created
+LAZY_PREFIXES = ("scipy", "simulations")
+
+# Smallest create parameters per kind, so the timing is dominated by imports
+KINDS = {
+    "physics": {"nx": 8, "ny": 8},
+    "mars": {"nx": 8, "ny": 8},
+    "venus": {"nx": 8, "ny": 8},
+    "volcano": {"nx": 8, "ny": 8},
+    "terraform": {},
+    "automata": {"nx": 8, "ny": 8},
+    "fluid": {"nx": 8, "ny": 8},
+    "universe": {"num_bodies": 8},
+    "algo": {"data": [2, 1]},
+}
+
+_IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+_KIND_PROBE = """
+import json, time
+import kinds
+started = time.perf_counter()
+kinds.create(%r, %r)
+first = time.perf_counter() - started
+started = time.perf_counter()
+kinds.create(%r, %r)
+print(json.dumps({"first_create_seconds": first, "warm_create_seconds": time.perf_counter() - started}))
+"""
+
+
+def run_probe(code: str):
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per measurement")
+    parser.add_argument("--check", action="store_true",
+                        help="exit 1 if importing the app loads scipy or any simulation module")
+    args = parser.parse_args()
+
+    runs = [run_probe(_IMPORT_PROBE) for _ in range(args.repeat)]
+    modules = runs[-1]["modules"]
+    eager = sorted({m.split(".")[0] if m.startswith("scipy") else m
+                    for m in modules if m.startswith(LAZY_PREFIXES)})
+
+    kinds = {}
+    for kind, params in KINDS.items():
+        samples = [run_probe(_KIND_PROBE % (kind, params, kind, params)) for _ in range(args.repeat)]
+        kinds[kind] = {
+            key: statistics.median(s[key] for s in samples)
+            for key in ("first_create_seconds", "warm_create_seconds")
+        }
+
+    report = {
+        "import_main_seconds": {
+            "median": statistics.median(r["seconds"] for r in runs),
+            "min": min(r["seconds"] for r in runs),
+            "max": max(r["seconds"] for r in runs),
+        },
+        "modules_loaded": len(modules),
+        "eager_heavy_modules": eager,
+        "kinds": kinds,
+        "python": sys.version.split()[0],
+    }
+    print(json.dumps(report, indent=2))
+    if args.check and eager:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+CSR vs matrix-free stencil Laplacian.
+
+For each grid size, builds the diffusion operator both ways and reports
+construction time, operator memory, apply() time (the stencil both
+allocating and writing into a preallocated `out`) and the largest
+difference between the two results. Prints JSON.
+
+    python benchmarks/stencil_operator.py --sizes 64,256,1024,2048 --repeat 20
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from simulations.physics_engine.grid.grid2d import Grid2D
+from simulations.physics_engine.models.diffusion import DiffusionModel
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def csr_nbytes(matrix) -> int:
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+
+def run(n: int, repeat: int):
+    grid = Grid2D(n, n)
+    state = np.random.default_rng(0).random(n * n)
+    out = np.empty_like(state)
+
+    started = time.perf_counter()
+    csr = DiffusionModel(grid, 0.1, backend="csr").get_operator()
+    csr_build = time.perf_counter() - started
+    started = time.perf_counter()
+    stencil = DiffusionModel(grid, 0.1, backend="stencil").get_operator()
+    stencil_build = time.perf_counter() - started
+
+    expected = csr.apply(state)
+    diff = float(np.abs(stencil.apply(state) - expected).max() / np.abs(expected).max())
+
+    csr_time = best_of(lambda: csr.apply(state), repeat)
+    stencil_time = best_of(lambda: stencil.apply(state), repeat)
+    stencil_out_time = best_of(lambda: stencil.apply(state, out=out), repeat)
+    return {
+        "grid": [n, n],
+        "build_seconds": {"csr": csr_build, "stencil": stencil_build},
+        "operator_bytes": {"csr": csr_nbytes(csr.matrix), "stencil": 0},
+        "apply_seconds": {"csr": csr_time, "stencil": stencil_time, "stencil_out": stencil_out_time},
+        "speedup": csr_time / stencil_out_time,
+        "max_relative_difference": diff,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="64,256,1024,2048")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    results = [run(int(n), args.repeat) for n in args.sizes.split(",")]
+    print(json.dumps({"numpy": np.__version__, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
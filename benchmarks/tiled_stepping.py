@@ -0,0 +1,114 @@
+"""
+Scaling of tiled multi-core stepping.
+
+For each grid size and thread count, steps the kernels that run in row
+tiles on the tile executor (simulations/physics_engine/grid/tiles.py):
+a diffusion step with the "stencil" and "csr" operators, a fluid step
+(advection) and a volcano step (lava flow). Reports seconds per step,
+the speedup over one thread and whether the final fields are
+bit-identical to the one-thread run. Prints JSON.
+
+    python benchmarks/tiled_stepping.py --sizes 1024,2048 --threads 1,2,4,8
+
+Speedups are bounded by the cores actually available (`cpu_count` in the
+output) and by memory bandwidth, since these kernels do little
+arithmetic per byte.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from simulations.earth.volcano import VolcanoEnvironment
+from simulations.fluid.smoke import FluidSimulation
+from simulations.physics_engine.core.integrator import get_integrator
+from simulations.physics_engine.env.environment import SimulationEnvironment
+from simulations.physics_engine.grid import tiles
+from simulations.physics_engine.grid.grid2d import Grid2D
+from simulations.physics_engine.models.diffusion import DiffusionModel
+
+
+def make_diffusion(backend: str):
+    def make(n: int):
+        grid = Grid2D(n, n)
+        dt = 0.2 * grid.dx * grid.dy / 0.1
+        env = SimulationEnvironment(n, n, dt, DiffusionModel(grid, 0.1, backend=backend).get_operator(),
+                                    get_integrator("euler"), fast_forward=False)
+        env.set_state(np.random.default_rng(0).random((n, n)))
+        return env, env.step, lambda: [env.get_field()]
+    return make
+
+
+def make_fluid(n: int):
+    sim = FluidSimulation(n, n)
+    rng = np.random.default_rng(0)
+    sim.density[...] = rng.random((n, n))
+    sim.u[...] = 4 * rng.standard_normal((n, n))
+    sim.v[...] = 4 * rng.standard_normal((n, n))
+    return sim, sim.step, lambda: [sim.density, sim.u, sim.v]
+
+
+def make_volcano(n: int):
+    env = VolcanoEnvironment(n, n)
+    env.lava[...] = np.random.default_rng(0).random((n, n))
+    return env, env.step, lambda: [env.lava]
+
+
+KERNELS = {
+    "diffusion/stencil": make_diffusion("stencil"),
+    "diffusion/csr": make_diffusion("csr"),
+    "fluid": make_fluid,
+    "volcano": make_volcano,
+}
+
+
+def measure(kernel: str, n: int, threads: int, steps: int):
+    tiles.set_threads(threads)
+    _, step, fields = KERNELS[kernel](n)
+    step() # warm up: pool threads, workspaces
+    started = time.perf_counter()
+    for _ in range(steps):
+        step()
+    elapsed = time.perf_counter() - started
+    return elapsed / steps, [f.copy() for f in fields()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="1024,2048")
+    # 1, 2, 4, ... up to the machine's core count by default
+    cores = os.cpu_count() or 1
+    parser.add_argument("--threads", default=",".join(str(t) for t in sorted(
+        {2 ** k for k in range(cores.bit_length())} | {cores})))
+    parser.add_argument("--kernels", default=",".join(KERNELS))
+    parser.add_argument("--steps", type=int, default=10)
+    args = parser.parse_args()
+    thread_counts = sorted({1} | {int(t) for t in args.threads.split(",")})
+
+    results = []
+    for n in (int(s) for s in args.sizes.split(",")):
+        for kernel in args.kernels.split(","):
+            runs = []
+            baseline, reference = None, None
+            for threads in thread_counts:
+                seconds, fields = measure(kernel, n, threads, args.steps)
+                if threads == 1:
+                    baseline, reference = seconds, fields
+                runs.append({
+                    "threads": threads,
+                    "seconds_per_step": seconds,
+                    "speedup": baseline / seconds,
+                    "identical": all(np.array_equal(a, b) for a, b in zip(reference, fields)),
+                })
+            results.append({"kernel": kernel, "grid": [n, n], "runs": runs})
+    tiles.set_threads(1)
+    print(json.dumps({"numpy": np.__version__, "cpu_count": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
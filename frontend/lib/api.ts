@@ -153,6 +153,15 @@ export const api = {
             return res.json();
         },
     },
+    // Server-side tick loop: frames are pushed at `fps`, control messages go back over the socket
+    stream: (session_id: string, onFrame: (frame: any) => void, steps = 1, fps = 30) => {
+        const ws = new WebSocket(`${API_BASE.replace(/^http/, "ws")}/ws/sim/${session_id}?steps=${steps}&fps=${fps}`);
+        ws.onmessage = (event) => onFrame(JSON.parse(event.data));
+        return {
+            send: (message: object) => ws.send(JSON.stringify(message)),
+            close: () => ws.close(),
+        };
+    },
     algorithms: {
         create: async (type: string, data: number[]) => {
             const res = await fetch(`${API_BASE}/algorithms/create`, {
@@ -1,5 +1,5 @@
 import numpy as np
-from scipy.signal import convolve2d
+from scipy.ndimage import convolve
 
 class GameOfLife:
     """
@@ -8,17 +8,17 @@ class GameOfLife:
     def __init__(self, nx: int, ny: int):
         self.nx = nx
         self.ny = ny
-        # Random initial state
-        self.grid = np.random.choice([0, 1], size=(nx, ny), p=[0.8, 0.2])
+        # Random initial state, one byte per cell
+        self.grid = np.random.choice(np.array([0, 1], dtype=np.uint8), size=(nx, ny), p=[0.8, 0.2])
         
-        # Kernel for counting neighbors
+        # Kernel for counting neighbors (at most 8, so counts fit in uint8 too)
         self.kernel = np.array([[1, 1, 1],
                                 [1, 0, 1],
-                                [1, 1, 1]])
+                                [1, 1, 1]], dtype=np.uint8)
 
     def step(self):
-        # Count neighbors
-        neighbors = convolve2d(self.grid, self.kernel, mode='same', boundary='wrap')
+        # Count neighbors (ndimage rather than scipy.signal, which is slow to import)
+        neighbors = convolve(self.grid, self.kernel, mode='wrap')
         
         # Apply rules
         # 1. Any live cell with 2 or 3 live neighbors survives.
@@ -36,5 +36,26 @@ class GameOfLife:
         
         self.grid = new_grid
 
+    @staticmethod
+    def step_many(sims):
+        """
+        Step several same-sized boards at once by stacking them and counting
+        neighbors with a single convolution over the stack.
+        """
+        if not sims:
+            return
+        grids = np.stack([sim.grid for sim in sims])
+        kernel = sims[0].kernel[np.newaxis]
+
+        # Kernel has depth 1, so wrapping only happens within each board
+        neighbors = convolve(grids, kernel, mode='wrap')
+
+        alive = grids == 1
+        new_grids = (alive & ((neighbors == 2) | (neighbors == 3))) | (~alive & (neighbors == 3))
+        new_grids = new_grids.astype(grids.dtype)
+
+        for sim, new_grid in zip(sims, new_grids):
+            sim.grid = new_grid.copy()
+
     def get_state(self):
         return self.grid
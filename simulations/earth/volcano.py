@@ -1,15 +1,16 @@
 import numpy as np
 from ..physics_engine.grid.grid2d import Grid2D
+from ..physics_engine.grid.tiles import get_executor
 
 class VolcanoEnvironment:
     """
     Simulates lava flow down a terrain.
     Lava is treated as a viscous fluid that spreads and hardens.
     """
-    def __init__(self, nx: int, ny: int):
+    def __init__(self, nx: int, ny: int, dtype=np.float64):
         self.grid = Grid2D(nx, ny)
-        self.terrain = self._generate_volcano()
-        self.lava = np.zeros((nx, ny))
+        self.terrain = self._generate_volcano().astype(dtype, copy=False)
+        self.lava = np.zeros((nx, ny), dtype=dtype)
         self.lava_source = (nx // 2, ny // 2)
         self.active = True
 
@@ -36,24 +37,52 @@ class VolcanoEnvironment:
         
         # Simple diffusion-like spreading based on height difference
         # This is a very rough approximation of viscous flow
-        for i in range(1, self.grid.nx - 1):
-            for j in range(1, self.grid.ny - 1):
-                if self.lava[i, j] > 0:
-                    h_curr = total_height[i, j]
-                    
-                    # Check neighbors
-                    neighbors = [(i+1, j), (i-1, j), (i, j+1), (i, j-1)]
-                    for ni, nj in neighbors:
-                        h_neigh = total_height[ni, nj]
-                        diff = h_curr - h_neigh
-                        if diff > 0:
-                            flow = diff * 0.1 # Viscosity factor
-                            amount = min(self.lava[i, j], flow)
-                            new_lava[i, j] -= amount
-                            new_lava[ni, nj] += amount
-                            
+        get_executor().run_rows(lambda r0, r1: self._flow_rows(total_height, new_lava, r0, r1),
+                                self.grid.nx, self.grid.ny)
         self.lava = new_lava
 
+    # Interior cells with lava pass some of it to each lower neighbour, in
+    # this order
+    NEIGHBOURS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+    VISCOSITY = 0.1
+
+    # Transfers reach a cell in the order a row-major sweep over the source
+    # cells would apply them: from (i-1, j), from (i, j-1), its own outflows,
+    # from (i, j+1), then from (i+1, j). (offset, inflow) pairs.
+    _TRANSFERS = (((1, 0), True), ((0, 1), True),
+                  ((1, 0), False), ((-1, 0), False), ((0, 1), False), ((0, -1), False),
+                  ((0, -1), True), ((-1, 0), True))
+
+    def _flow_rows(self, total_height, new_lava, r0, r1):
+        """
+        Move lava into and out of rows [r0, r1) of new_lava. Flows are
+        computed for the source rows one beyond each side (the halo), so
+        row tiles can run in parallel and sum exactly as one sweep would.
+        """
+        nx, ny = self.grid.nx, self.grid.ny
+        s0, s1 = max(1, r0 - 1), min(nx - 1, r1 + 1)
+        if s0 >= s1 or ny < 3:
+            return
+        h = total_height[s0:s1, 1:-1]
+        lava = self.lava[s0:s1, 1:-1]
+        active = lava > 0
+        flows = {}
+        for di, dj in self.NEIGHBOURS:
+            diff = h - total_height[s0 + di:s1 + di, 1 + dj:ny - 1 + dj]
+            flows[di, dj] = np.where(active & (diff > 0), np.minimum(lava, diff * self.VISCOSITY), 0)
+
+        for (di, dj), inflow in self._TRANSFERS:
+            oi, oj = (di, dj) if inflow else (0, 0)
+            lo, hi = max(s0, r0 - oi), min(s1, r1 - oi)
+            if lo >= hi:
+                continue
+            target = new_lava[lo + oi:hi + oi, 1 + oj:ny - 1 + oj]
+            amount = flows[di, dj][lo - s0:hi - s0]
+            if inflow:
+                target += amount
+            else:
+                target -= amount
+
     def get_state(self):
         return {
             "terrain": self.terrain,
@@ -1,29 +1,49 @@
 import numpy as np
 from scipy.ndimage import map_coordinates
+from simulations.physics_engine.grid.tiles import get_executor
+from simulations.physics_engine.solvers.multigrid import MultigridSolver
 
 class FluidSimulation:
     """
     Simple Eulerian Fluid Simulation (Stable Fluids style).
     Simulates density (smoke) and velocity fields.
+    With projection=True the velocity is made divergence-free every step,
+    which gives proper swirls at the cost of a multigrid pressure solve
+    (ValueError if the grid sides do not halve enough for multigrid).
     """
-    def __init__(self, nx: int, ny: int, dt: float = 0.1, diffusion: float = 0.0):
+    def __init__(self, nx: int, ny: int, dt: float = 0.1, diffusion: float = 0.0, projection: bool = False,
+                 dtype=np.float64):
         self.nx = nx
         self.ny = ny
         self.dt = dt
         self.diff = diffusion
+        self.projection = projection
+        # Pressure only exists with projection, which warm-starts from it
+        self.pressure = None
+        self._pressure_solver = None
+        if projection:
+            self.pressure = np.zeros((nx, ny), dtype=dtype)
+            self._pressure_solver = MultigridSolver((nx, ny), boundary="periodic", dtype=dtype)
         
-        # Fields
-        self.density = np.zeros((nx, ny))
-        self.u = np.zeros((nx, ny)) # x-velocity
-        self.v = np.zeros((nx, ny)) # y-velocity
+        # Fields (dtype=np.float32 halves their memory)
+        self.density = np.zeros((nx, ny), dtype=dtype)
+        self.u = np.zeros((nx, ny), dtype=dtype) # x-velocity
+        self.v = np.zeros((nx, ny), dtype=dtype) # y-velocity
         
         # Color fields
-        self.r = np.zeros((nx, ny))
-        self.g = np.zeros((nx, ny))
-        self.b = np.zeros((nx, ny))
-        
-        # Coordinates for interpolation
-        self.x, self.y = np.meshgrid(np.arange(ny), np.arange(nx))
+        self.r = np.zeros((nx, ny), dtype=dtype)
+        self.g = np.zeros((nx, ny), dtype=dtype)
+        self.b = np.zeros((nx, ny), dtype=dtype)
+
+    # Coordinates for interpolation: the row (x) and column (y) index of every
+    # cell, as broadcast views rather than stored meshgrids
+    @property
+    def x(self):
+        return np.broadcast_to(np.arange(self.nx, dtype=self.density.dtype)[:, np.newaxis], (self.nx, self.ny))
+
+    @property
+    def y(self):
+        return np.broadcast_to(np.arange(self.ny, dtype=self.density.dtype)[np.newaxis, :], (self.nx, self.ny))
 
     def add_density(self, x, y, amount, color=(1.0, 1.0, 1.0)):
         self.density[x, y] += amount
@@ -39,6 +59,8 @@ class FluidSimulation:
         # 1. Advect Velocity (Self-Advection)
         self.u = self._advect(self.u, self.u, self.v)
         self.v = self._advect(self.v, self.u, self.v)
+        if self.projection:
+            self._project()
         
         # 2. Advect Density (moved by velocity)
         self.density = self._advect(self.density, self.u, self.v)
@@ -48,14 +70,25 @@ class FluidSimulation:
         
         # 3. Diffuse (Optional, skipped for MVP as numerical dissipation is often enough)
         
-        # 4. Project (Enforce incompressibility - skipped for MVP visual smoke)
-        # A full projection step requires solving a Poisson equation. 
-        # For visual "smoke", advection alone looks okay-ish but won't swirl correctly without projection.
-        # We'll add a simple curl-noise or just leave as advection-only for MVP speed.
+        # 4. Project (Enforce incompressibility) - done above, before the density
+        # is moved, when projection is enabled. Without it, advection alone
+        # looks okay-ish for visual "smoke" but won't swirl correctly.
         
         # Decay
         self.density *= 0.99
 
+    def _project(self):
+        # Solve Laplacian(p) = div(u, v) on the periodic grid (unit cell
+        # spacing), warm-started from the last pressure, and subtract grad(p).
+        # Backward-difference divergence and forward-difference gradient
+        # compose to exactly the 5-point Laplacian, so the result is
+        # divergence-free to the solver tolerance.
+        div = self.u - np.roll(self.u, 1, 0) + self.v - np.roll(self.v, 1, 1)
+        pressure, _ = self._pressure_solver.solve(-div, x0=self.pressure, rtol=1e-4, maxiter=20)
+        self.pressure = pressure.astype(self.u.dtype, copy=False)
+        self.u -= np.roll(self.pressure, -1, 0) - self.pressure
+        self.v -= np.roll(self.pressure, -1, 1) - self.pressure
+
     def _advect(self, field, u, v):
         # Backtrace
         # New pos = Old pos - velocity * dt
@@ -64,12 +97,20 @@ class FluidSimulation:
         # Map coordinates expects (row, col) -> (x, y) in numpy indexing
         # u is velocity in row direction (x), v is velocity in col direction (y)
         
-        back_x = self.x - u * self.dt
-        back_y = self.y - v * self.dt
-        
-        # Interpolate
-        # map_coordinates uses (row_coords, col_coords)
-        return map_coordinates(field, [back_x, back_y], order=1, mode='wrap')
+        # Each cell is interpolated on its own, so row tiles of the output
+        # can be filled in parallel (see grid/tiles.py) with the same result
+        out = np.empty_like(field)
+        x, y = self.x, self.y
+
+        def rows(r0, r1):
+            back_x = x[r0:r1] - u[r0:r1] * self.dt
+            back_y = y[r0:r1] - v[r0:r1] * self.dt
+
+            # Interpolate
+            # map_coordinates uses (row_coords, col_coords)
+            map_coordinates(field, [back_x, back_y], order=1, mode='wrap', output=out[r0:r1])
+        get_executor().run_rows(rows, self.nx, self.ny)
+        return out
 
     def get_state(self):
         return {
@@ -5,9 +5,9 @@ class MarsEnvironment:
     """
     Simulates a Mars-like environment with procedural terrain and simple atmospheric effects.
     """
-    def __init__(self, nx: int, ny: int, lx: float = 100.0, ly: float = 100.0):
+    def __init__(self, nx: int, ny: int, lx: float = 100.0, ly: float = 100.0, dtype=np.float64):
         self.grid = Grid2D(nx, ny, lx, ly)
-        self.terrain = self._generate_terrain()
+        self.terrain = self._generate_terrain().astype(dtype, copy=False)
         self.rovers = []
         self.dust_intensity = 0.0
 
@@ -0,0 +1,115 @@
+import numpy as np
+import scipy.linalg
+from .operator import LinearOperator, SecondOrderOperator, SpectralOperator, StencilOperator
+
+# Upper bound on the memory of one Krylov basis; large grids get fewer vectors
+KRYLOV_BYTES = 256 * 1024 * 1024
+KRYLOV_DIM = 30
+
+def operator_norm(operator: LinearOperator) -> float:
+    """
+    The operator's 1-norm (max column sum), or for spectral operators the
+    largest |symbol|: a bound on how fast exp(t*A) can change a state.
+    """
+    if isinstance(operator, StencilOperator):
+        return float(sum(abs(c) for c in operator.coefficients.values()))
+    if isinstance(operator, SpectralOperator):
+        return float(np.abs(operator.symbol).max())
+    if isinstance(operator, SecondOrderOperator):
+        return max(1.0, operator_norm(operator.acceleration))
+    return float(abs(operator.matrix).sum(axis=0).max())
+
+def is_symmetric(operator: LinearOperator) -> bool:
+    if isinstance(operator, StencilOperator):
+        c = operator.coefficients
+        return all(c.get((-di, -dj)) == w for (di, dj), w in c.items())
+    if isinstance(operator, SpectralOperator):
+        return True # real symbols of real, even operators like the Laplacian
+    if isinstance(operator, SecondOrderOperator):
+        return False
+    m = operator.matrix
+    return m.shape[0] == m.shape[1] and abs(m - m.T).max() == 0
+
+def krylov_dim(size: int) -> int:
+    return int(min(KRYLOV_DIM, max(4, KRYLOV_BYTES // (8 * size) - 1)))
+
+def estimate_krylov_matvecs(operator: LinearOperator, t: float, m: int, symmetric: bool = None,
+                            norm: float = None) -> float:
+    """
+    Rough operator applications krylov_expm_multiply needs for exp(t*A),
+    calibrated on the diffusion and wave operators. A basis of m vectors
+    covers about ||tA|| = (m / 9)^2 for symmetric (diffusion-like)
+    operators, t * sqrt(||A||) = m / 4 for wave operators (whose
+    frequencies only reach sqrt(||A||)) and ||tA|| = m / 2 otherwise.
+    """
+    if isinstance(operator, SecondOrderOperator):
+        norm = operator_norm(operator.acceleration) if norm is None else norm
+        substeps = 4 * t * np.sqrt(norm) / m
+    else:
+        norm = operator_norm(operator) if norm is None else norm
+        symmetric = is_symmetric(operator) if symmetric is None else symmetric
+        substeps = 9 * np.sqrt(t * norm) / m if symmetric else 2 * t * norm / m
+    return m * max(1.0, float(substeps))
+
+def krylov_expm_multiply(operator: LinearOperator, v: np.ndarray, t: float, m: int = None,
+                         tol: float = 1e-8, symmetric: bool = None):
+    """
+    exp(t*A) v by Krylov subspace projection: Lanczos for symmetric A,
+    Arnoldi otherwise, restarted over sub-intervals of t whose length is
+    picked from the Krylov error estimate. Costs m operator applications
+    per sub-interval, with no stability limit on t.
+    Returns (result, stats) with the operator applications and sub-intervals used.
+    """
+    if symmetric is None:
+        symmetric = is_symmetric(operator)
+    w = np.array(v, dtype=np.float64)
+    n = w.size
+    m = min(m or krylov_dim(n), n)
+    basis = np.empty((m + 1, n))
+    stats = {"matvecs": 0, "substeps": 0}
+    norm_v = float(np.linalg.norm(w))
+    done = 0.0
+
+    while done < t and norm_v > 0:
+        beta = float(np.linalg.norm(w))
+        if beta == 0:
+            break
+        np.divide(w, beta, out=basis[0])
+        h = np.zeros((m + 1, m))
+        k = m
+        exact = False
+        for j in range(m):
+            p = basis[j + 1]
+            operator.apply(basis[j], out=p)
+            stats["matvecs"] += 1
+            if symmetric:
+                if j > 0:
+                    p -= h[j, j - 1] * basis[j - 1]
+                h[j, j] = np.dot(basis[j], p)
+                p -= h[j, j] * basis[j]
+            else:
+                for i in range(j + 1):
+                    h[i, j] = np.dot(basis[i], p)
+                    p -= h[i, j] * basis[i]
+            h[j + 1, j] = np.linalg.norm(p)
+            if symmetric and j + 1 < m:
+                h[j, j + 1] = h[j + 1, j]
+            if h[j + 1, j] <= 1e-12 * (abs(h[j, j]) + 1.0):
+                # The subspace is invariant: the projection is exact
+                k, exact = j + 1, True
+                break
+            p /= h[j + 1, j]
+
+        tau = t - done
+        while True:
+            e = scipy.linalg.expm(tau * h[:k, :k])
+            error = 0.0 if exact else beta * abs(h[k, k - 1] * tau * e[k - 1, 0])
+            allowed = tol * norm_v * tau / t
+            if error <= allowed:
+                break
+            tau *= min(0.5, 0.9 * (allowed / error) ** (1.0 / k))
+        np.dot(e[:, 0], basis[:k], out=w)
+        w *= beta
+        done = t if tau >= t - done else done + tau
+        stats["substeps"] += 1
+    return w, stats
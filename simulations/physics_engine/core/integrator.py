@@ -1,21 +1,420 @@
 import numpy as np
-from .operator import LinearOperator
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+from .operator import LinearOperator, SpectralOperator, StencilOperator
+from ..solvers.multigrid import MultigridSolver
 
 class Integrator:
+    """
+    step() returns the next state as a new array. step_inplace() overwrites
+    `state` with it instead; integrators that override it keep their stage
+    buffers in a workspace that is allocated on first use and reused for
+    every later step of the same size, so stepping allocates nothing.
+
+    `evaluations` is the number of operator applications per step, used to
+    weigh stepping against other ways of advancing (None: not comparable,
+    e.g. implicit solves).
+    """
+    evaluations = None
+
     def step(self, state: np.ndarray, operator: LinearOperator, dt: float) -> np.ndarray:
         raise NotImplementedError
 
+    def check(self, operator: LinearOperator):
+        """Raise ValueError if this integrator cannot step `operator`."""
+
+    def step_inplace(self, state: np.ndarray, operator: LinearOperator, dt: float) -> np.ndarray:
+        state[...] = self.step(state, operator, dt)
+        return state
+
+    def advance(self, state: np.ndarray, operator: LinearOperator, dt: float, steps: int) -> np.ndarray:
+        """`steps` in-place steps of `dt`; integrators that can jump ahead override this."""
+        for _ in range(steps):
+            self.step_inplace(state, operator, dt)
+        return state
+
+    def _workspace(self, state: np.ndarray, count: int) -> list:
+        """`count` scratch arrays shaped like `state`, kept between steps."""
+        buffers = self.__dict__.get("_buffers")
+        if (buffers is None or len(buffers) < count or buffers[0].shape != state.shape
+                or buffers[0].dtype != state.dtype):
+            buffers = [np.empty_like(state) for _ in range(count)]
+            self._buffers = buffers
+        return buffers[:count]
+
+    def __getstate__(self):
+        # Scratch buffers are rebuilt on the next step rather than pickled
+        state = dict(self.__dict__)
+        state.pop("_buffers", None)
+        return state
+
 class ExplicitEuler(Integrator):
+    evaluations = 1
+
     def step(self, state: np.ndarray, operator: LinearOperator, dt: float) -> np.ndarray:
         # s_{t+1} = s_t + dt * (A * s_t)
         # This assumes the system is ds/dt = A * s
         derivative = operator.apply(state)
         return state + dt * derivative
 
+    def step_inplace(self, state: np.ndarray, operator: LinearOperator, dt: float) -> np.ndarray:
+        (k,) = self._workspace(state, 1)
+        operator.apply(state, out=k)
+        k *= dt
+        state += k
+        return state
+
 class RK4(Integrator):
+    evaluations = 4
+
     def step(self, state: np.ndarray, operator: LinearOperator, dt: float) -> np.ndarray:
         k1 = operator.apply(state)
         k2 = operator.apply(state + 0.5 * dt * k1)
         k3 = operator.apply(state + 0.5 * dt * k2)
         k4 = operator.apply(state + dt * k3)
         return state + (dt / 6.0) * (k1 + 2*k2 + 2*k3 + k4)
+
+    def step_inplace(self, state: np.ndarray, operator: LinearOperator, dt: float) -> np.ndarray:
+        # Three buffers: the current stage k, the stage input and the
+        # running sum k1 + 2*k2 + 2*k3 + k4
+        k, stage, total = self._workspace(state, 3)
+        operator.apply(state, out=k)
+        np.copyto(total, k)
+        for fraction in (0.5, 0.5, 1.0):
+            np.multiply(k, fraction * dt, out=stage)
+            stage += state
+            operator.apply(stage, out=k)
+            total += k
+            if fraction != 1.0:
+                total += k
+        total *= dt / 6.0
+        state += total
+        return state
+
+class ThetaMethod(Integrator):
+    """
+    Implicit theta scheme for ds/dt = A * s:
+
+        (I - theta*dt*A) s_{t+1} = (I + (1 - theta)*dt*A) s_t
+
+    Unconditionally stable for diffusion operators, so dt is not limited to
+    ~dx^2 / (4D) like the explicit methods. The system matrix only changes
+    with (operator, dt), so it is factorized once with a sparse LU and the
+    factorization is reused every step. Systems with more than
+    `direct_limit` unknowns, where LU fill-in gets too large, are solved
+    iteratively instead, warm-started from the current state: with
+    conjugate gradients preconditioned by a multigrid cycle when the
+    operator is a 5-point stencil Laplacian, otherwise with conjugate
+    gradients preconditioned by the diagonal (Jacobi) if the system is
+    symmetric (as the diffusion Laplacian's is), or with GMRES and a cached
+    incomplete LU if it is not (e.g. the wave model's first-order system).
+    An incomplete LU pivots and permutes columns, so it is not symmetric
+    and cannot precondition CG. A solve that has not converged after
+    `maxiter` iterations (inner iterations for GMRES) raises RuntimeError.
+    """
+    theta = 1.0
+    restart = 20 # GMRES inner iterations per restart cycle
+
+    def __init__(self, direct_limit: int = 250_000, rtol: float = 1e-10, maxiter: int = 2000):
+        self.direct_limit = direct_limit
+        self.rtol = rtol
+        self.maxiter = maxiter
+        self._operator = None
+        self._dt = None
+        self._solve = None
+
+    def check(self, operator: LinearOperator):
+        # Spectral operators solve directly; everything else is assembled
+        if not isinstance(operator, SpectralOperator) and not operator.has_matrix:
+            name = type(operator).__name__
+            if hasattr(operator, "acceleration"):
+                name += f" of {type(operator.acceleration).__name__}"
+            raise ValueError(f"{type(self).__name__} needs an operator with a sparse matrix, not {name}")
+
+    def _prepare(self, operator: LinearOperator, dt: float):
+        if operator is self._operator and dt == self._dt:
+            return
+        scale = self.theta * dt
+        multigrid = None
+        if isinstance(operator, SpectralOperator):
+            # Diagonal in Fourier space: the solve is exact and needs no setup
+            self._solve = lambda rhs, guess: operator.solve(rhs, scale)
+            self._operator = operator
+            self._dt = dt
+            return
+        if isinstance(operator, StencilOperator) and operator.nx * operator.ny > self.direct_limit:
+            try:
+                multigrid = MultigridSolver.for_operator(operator, alpha=1.0, beta=scale)
+            except ValueError:
+                pass
+
+        if multigrid is not None:
+            # Matrix-free: CG runs on the stencil itself
+            n = operator.nx * operator.ny
+            system = spla.LinearOperator((n, n), matvec=lambda x: x - scale * operator.apply(x), dtype=np.float64)
+            self._solve = self._iterative(system, multigrid.as_preconditioner())
+        else:
+            a = sp.csc_matrix(operator.matrix)
+            system = (sp.identity(a.shape[0], format='csc') - scale * a).tocsc()
+            if system.shape[0] <= self.direct_limit:
+                lu = spla.splu(system)
+                self._solve = lambda rhs, guess: lu.solve(rhs)
+            elif abs(system - system.T).max() == 0:
+                # CG needs a symmetric (positive definite) system and preconditioner
+                inverse_diagonal = 1.0 / system.diagonal()
+                preconditioner = spla.LinearOperator(system.shape, lambda x: inverse_diagonal * x)
+                self._solve = self._iterative(system.tocsr(), preconditioner, "cg")
+            else:
+                try:
+                    ilu = spla.spilu(system, drop_tol=1e-4, fill_factor=10)
+                    preconditioner = spla.LinearOperator(system.shape, ilu.solve)
+                except RuntimeError:
+                    # Dropping entries can leave the incomplete factor singular
+                    preconditioner = None
+                self._solve = self._iterative(system.tocsr(), preconditioner, "gmres")
+        self._operator = operator
+        self._dt = dt
+
+    def _iterative(self, system, preconditioner, method: str = "cg"):
+        if method == "cg":
+            iterate, name, options = spla.cg, "CG", dict(maxiter=self.maxiter)
+        else:
+            # GMRES counts maxiter in restart cycles
+            iterate, name = spla.gmres, "GMRES"
+            options = dict(restart=self.restart, maxiter=max(1, self.maxiter // self.restart))
+
+        def solve(rhs, guess):
+            result, info = iterate(system, rhs, x0=guess, rtol=self.rtol, M=preconditioner, **options)
+            if info > 0:
+                raise RuntimeError(f"{name} did not converge in {self.maxiter} iterations")
+            if info < 0:
+                raise RuntimeError(f"{name} failed: illegal input or breakdown")
+            return result
+        return solve
+
+    def __getstate__(self):
+        # Factorizations do not pickle; they are rebuilt on the next step
+        return dict(super().__getstate__(), _operator=None, _dt=None, _solve=None)
+
+    def step(self, state: np.ndarray, operator: LinearOperator, dt: float) -> np.ndarray:
+        self._prepare(operator, dt)
+        rhs = state
+        if self.theta != 1.0:
+            rhs = state + ((1.0 - self.theta) * dt) * operator.apply(state)
+        return self._solve(rhs, state)
+
+    def step_inplace(self, state: np.ndarray, operator: LinearOperator, dt: float) -> np.ndarray:
+        self._prepare(operator, dt)
+        rhs = state
+        if self.theta != 1.0:
+            (rhs,) = self._workspace(state, 1)
+            operator.apply(state, out=rhs)
+            rhs *= (1.0 - self.theta) * dt
+            rhs += state
+        # The solvers return a new array; only the right-hand side is reused
+        state[...] = self._solve(rhs, state)
+        return state
+
+class BackwardEuler(ThetaMethod):
+    """First order, L-stable: stiff high-frequency modes are damped out."""
+    theta = 1.0
+
+class CrankNicolson(ThetaMethod):
+    """Second order, A-stable; very stiff modes decay slowly and may oscillate in sign."""
+    theta = 0.5
+
+class EmbeddedRK(Integrator):
+    """
+    Explicit Runge-Kutta pair: the weights `b` give the solution and
+    `b_hat` a lower order estimate whose difference measures the local
+    error. step() takes a plain fixed step; integrate() adapts dt to meet
+    rtol/atol. Both pairs here are FSAL (first same as last): the final
+    stage is A * s_{t+1}, which is reused as the first stage of the next
+    step, so an accepted step costs one operator application less.
+    """
+    c = ()
+    a = ()
+    b = ()
+    b_hat = ()
+    error_order = 1 # order of the embedded estimate
+
+    @property
+    def evaluations(self):
+        return len(self.c)
+
+    def _stages(self, state, operator, dt, k1):
+        k = [k1]
+        for i in range(1, len(self.c)):
+            increment = sum(coef * kj for coef, kj in zip(self.a[i - 1], k) if coef)
+            k.append(operator.apply(state + dt * increment))
+        return k
+
+    def _combine(self, state, dt, k, weights):
+        return state + dt * sum(w * kj for w, kj in zip(weights, k) if w)
+
+    def step(self, state: np.ndarray, operator: LinearOperator, dt: float) -> np.ndarray:
+        k = self._stages(state, operator, dt, operator.apply(state))
+        return self._combine(state, dt, k, self.b)
+
+    def integrate(self, state: np.ndarray, operator: LinearOperator, duration: float,
+                  rtol: float = 1e-6, atol: float = 1e-9, dt: float = None,
+                  max_steps: int = 100_000, safety: float = 0.9):
+        """
+        Advance `state` by `duration` with error control.
+        Returns (new state, stats) where stats counts accepted/rejected
+        steps and operator applications, and `dt` is the step size to
+        start from next time.
+        """
+        if duration < 0:
+            raise ValueError("duration must not be negative")
+        if rtol <= 0 and atol <= 0:
+            raise ValueError("rtol or atol must be positive")
+        stats = {"accepted": 0, "rejected": 0, "evaluations": 1, "dt": dt}
+        if duration == 0:
+            return state, stats
+
+        k1 = operator.apply(state)
+        if dt is None:
+            # Step size where the first-order change is about 1% of the state
+            scale = atol + rtol * np.abs(state)
+            d0 = np.sqrt(np.mean((state / scale) ** 2))
+            d1 = np.sqrt(np.mean((k1 / scale) ** 2))
+            dt = 0.01 * d0 / d1 if d0 > 1e-5 and d1 > 1e-5 else 1e-6
+        exponent = 1.0 / (self.error_order + 1)
+
+        t = 0.0
+        while t < duration:
+            if stats["accepted"] + stats["rejected"] >= max_steps:
+                raise RuntimeError(f"Adaptive integration needed more than {max_steps} steps")
+            h = min(dt, duration - t)
+            last = duration - t <= dt
+            k = self._stages(state, operator, h, k1)
+            stats["evaluations"] += len(k) - 1
+            new_state = self._combine(state, h, k, self.b)
+            error = h * sum((w - w_hat) * kj for w, w_hat, kj in zip(self.b, self.b_hat, k) if w != w_hat)
+            scale = atol + rtol * np.maximum(np.abs(state), np.abs(new_state))
+            norm = float(np.sqrt(np.mean((error / scale) ** 2)))
+
+            if norm <= 1.0:
+                t = duration if last else t + h
+                state = new_state
+                k1 = k[-1] # FSAL: last stage is A * new_state
+                stats["accepted"] += 1
+                factor = 5.0 if norm == 0 else min(5.0, safety * norm ** -exponent)
+                # A shortened final step says nothing about the step size to keep
+                if not last or factor < 1.0:
+                    dt = h * factor
+            else:
+                stats["rejected"] += 1
+                dt = h * max(0.2, safety * norm ** -exponent)
+        stats["dt"] = float(dt)
+        return state, stats
+
+class BogackiShampine(EmbeddedRK):
+    """3(2) pair, cheap (3 new evaluations per step); good for loose tolerances."""
+    c = (0.0, 1/2, 3/4, 1.0)
+    a = ((1/2,), (0.0, 3/4), (2/9, 1/3, 4/9))
+    b = (2/9, 1/3, 4/9, 0.0)
+    b_hat = (7/24, 1/4, 1/3, 1/8)
+    error_order = 2
+
+class DormandPrince(EmbeddedRK):
+    """5(4) pair (as in ode45 / RK45), 6 new evaluations per step; for tight tolerances."""
+    c = (0.0, 1/5, 3/10, 4/5, 8/9, 1.0, 1.0)
+    a = (
+        (1/5,),
+        (3/40, 9/40),
+        (44/45, -56/15, 32/9),
+        (19372/6561, -25360/2187, 64448/6561, -212/729),
+        (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+        (35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84),
+    )
+    b = (35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84, 0.0)
+    b_hat = (5179/57600, 0.0, 7571/16695, 393/640, -92097/339200, 187/2100, 1/40)
+    error_order = 4
+
+class ExponentialIntegrator(Integrator):
+    """
+    s_{t+dt} = exp(dt * A) s_t, the exact solution, for operators that
+    provide propagate() (SpectralOperator). advance() makes a single jump
+    of steps * dt, so its cost does not depend on the number of steps.
+    """
+    def check(self, operator: LinearOperator):
+        if not hasattr(operator, "propagate"):
+            raise ValueError(f"The exact integrator needs an operator with propagate(), not {type(operator).__name__}")
+
+    def step(self, state: np.ndarray, operator: LinearOperator, dt: float) -> np.ndarray:
+        self.check(operator)
+        return operator.propagate(state, dt)
+
+    def step_inplace(self, state: np.ndarray, operator: LinearOperator, dt: float) -> np.ndarray:
+        self.check(operator)
+        return operator.propagate(state, dt, out=state)
+
+    def advance(self, state: np.ndarray, operator: LinearOperator, dt: float, steps: int) -> np.ndarray:
+        if steps > 0:
+            self.step_inplace(state, operator, steps * dt)
+        return state
+
+class VelocityVerlet(Integrator):
+    """
+    Leapfrog in kick-drift-kick form for u'' = A u, on SecondOrderOperator
+    states [u, u']:
+
+        v += dt/2 * A u;  u += dt * v;  v += dt/2 * A u
+
+    Symplectic and time-reversible, so wave energy stays bounded instead
+    of drifting, with one application of A per step: advance() carries
+    the acceleration over from one step to the next.
+    """
+    evaluations = 1
+
+    def check(self, operator: LinearOperator):
+        if not hasattr(operator, "acceleration"):
+            raise ValueError(f"Verlet needs a second-order operator, not {type(operator).__name__}")
+
+    def step(self, state: np.ndarray, operator: LinearOperator, dt: float) -> np.ndarray:
+        return self.advance(state.copy(), operator, dt, 1)
+
+    def step_inplace(self, state: np.ndarray, operator: LinearOperator, dt: float) -> np.ndarray:
+        return self.advance(state, operator, dt, 1)
+
+    def advance(self, state: np.ndarray, operator: LinearOperator, dt: float, steps: int) -> np.ndarray:
+        self.check(operator)
+        if steps <= 0:
+            return state
+        n = operator.size
+        u, v = state[:n], state[n:]
+        a, scratch = self._workspace(u, 2)
+        operator.acceleration.apply(u, out=a)
+        for _ in range(steps):
+            np.multiply(a, 0.5 * dt, out=scratch)
+            v += scratch
+            np.multiply(v, dt, out=scratch)
+            u += scratch
+            operator.acceleration.apply(u, out=a)
+            np.multiply(a, 0.5 * dt, out=scratch)
+            v += scratch
+        return state
+
+INTEGRATORS = {
+    "euler": ExplicitEuler,
+    "rk4": RK4,
+    "backward_euler": BackwardEuler,
+    "crank_nicolson": CrankNicolson,
+    "bogacki_shampine": BogackiShampine,
+    "dormand_prince": DormandPrince,
+    "exact": ExponentialIntegrator,
+    "verlet": VelocityVerlet,
+}
+
+ADAPTIVE_INTEGRATORS = {
+    "bogacki_shampine": BogackiShampine,
+    "dormand_prince": DormandPrince,
+}
+
+def get_integrator(name: str) -> Integrator:
+    """Build an integrator by name. Raises ValueError for unknown names."""
+    if name not in INTEGRATORS:
+        raise ValueError(f"Unknown integrator '{name}', expected one of {sorted(INTEGRATORS)}")
+    return INTEGRATORS[name]()
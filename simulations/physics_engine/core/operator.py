@@ -1,16 +1,51 @@
+import itertools
 import numpy as np
+import scipy.fft
 import scipy.sparse as sp
+try:
+    # SciPy's internal CSR mat-vec kernel; private, so it may move in a release
+    from scipy.sparse._sparsetools import csr_matvec as _csr_matvec
+except ImportError:
+    _csr_matvec = None
+from ..grid.tiles import get_executor
 
 class LinearOperator:
     """
     Wraps a SciPy sparse matrix to act as a linear operator on the state vector.
     """
+    # Set on instances held by a process-wide cache (see models/diffusion.py).
+    # Memory estimates skip shared operators and the cache is charged once;
+    # the flag is not pickled, since an unpickled operator is a private copy.
+    shared = False
+    # Whether `matrix` can be assembled, for integrators that need it
+    has_matrix = True
+
     def __init__(self, matrix: sp.spmatrix):
         self.matrix = matrix
 
-    def apply(self, state_vector: np.ndarray) -> np.ndarray:
-        """Apply the operator to a state vector (flattened array)."""
-        return self.matrix.dot(state_vector)
+    def apply(self, state_vector: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """
+        Apply the operator to a state vector (flattened array). With `out`
+        (same size, must not alias the state) the result is written there,
+        in row tiles on the tile executor (see grid/tiles.py).
+        """
+        if out is None:
+            return self.matrix.dot(state_vector)
+        m = self.matrix
+        if (_csr_matvec is not None and getattr(m, "format", None) == "csr"
+                and m.dtype == state_vector.dtype == out.dtype
+                and state_vector.ndim == 1 and out.flags.c_contiguous):
+            # SciPy's own CSR mat-vec kernel accumulates into y, avoiding
+            # the result allocation of dot(). It sums each row on its own,
+            # so a tile of rows only needs its slice of indptr.
+            def rows(r0, r1):
+                y = out[r0:r1]
+                y.fill(0)
+                _csr_matvec(r1 - r0, m.shape[1], m.indptr[r0:r1 + 1], m.indices, m.data, state_vector, y)
+            get_executor().run_rows(rows, m.shape[0])
+        else:
+            out[...] = m @ state_vector
+        return out
 
     def __add__(self, other):
         if isinstance(other, LinearOperator):
@@ -19,3 +54,256 @@ class LinearOperator:
 
     def __mul__(self, scalar):
         return LinearOperator(self.matrix * scalar)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop("shared", None)
+        return state
+
+BOUNDARIES = ("dirichlet", "periodic")
+
+def _shift_pairs(length: int, offset: int, periodic: bool):
+    """
+    (destination, source) slice pairs along one axis such that
+    dst[k] receives src[k + offset]; out-of-range neighbours are either
+    dropped (zero Dirichlet) or wrapped around (periodic).
+    """
+    if offset == 0:
+        return [(slice(0, length), slice(0, length))]
+    if abs(offset) >= length:
+        if not periodic:
+            return []
+        offset = offset % length
+        if offset == 0:
+            return [(slice(0, length), slice(0, length))]
+    if offset > 0:
+        pairs = [(slice(0, length - offset), slice(offset, length))]
+        if periodic:
+            pairs.append((slice(length - offset, length), slice(0, offset)))
+    else:
+        pairs = [(slice(-offset, length), slice(0, length + offset))]
+        if periodic:
+            pairs.append((slice(0, -offset), slice(length + offset, length)))
+    return pairs
+
+class StencilOperator(LinearOperator):
+    """
+    Matrix-free constant-coefficient stencil on an (nx, ny) grid.
+
+    `coefficients` maps a (di, dj) offset to its weight, so that
+        (A u)[i, j] = sum of c * u[i + di, j + dj]
+    with neighbours outside the grid treated as zero ("dirichlet") or
+    wrapped around ("periodic"). The state is the row-major flattening of
+    the field (as StateVector.from_field produces); states holding several
+    stacked fields get the stencil applied to each field.
+
+    apply() works with NumPy slices on the reshaped field and writes into
+    `out` when given, so no index arrays are stored and, for stencils whose
+    neighbours share one weight (like the 5-point Laplacian), no
+    temporaries are allocated. `matrix` builds the equivalent CSR matrix
+    on first use, for solvers that need one. Large fields are applied in
+    row tiles on the tile executor (see grid/tiles.py), with the same
+    result.
+    """
+    BLOCK_BYTES = 256 * 1024
+
+    def __init__(self, shape: tuple, coefficients: dict, boundary: str = "dirichlet"):
+        if boundary not in BOUNDARIES:
+            raise ValueError(f"Unknown boundary '{boundary}', expected one of {BOUNDARIES}")
+        self.shape = tuple(shape)
+        self.nx, self.ny = self.shape
+        self.boundary = boundary
+        self.coefficients = {tuple(k): float(v) for k, v in coefficients.items() if v != 0}
+        self._matrix = None
+
+        periodic = boundary == "periodic"
+        self._center = self.coefficients.get((0, 0), 0.0)
+        neighbours = {k: v for k, v in self.coefficients.items() if k != (0, 0)}
+        # Neighbours are summed unscaled and the sum is scaled once at the
+        # end, so the most common weight needs no temporary arrays
+        weights = list(neighbours.values())
+        self._scale = max(set(weights), key=weights.count) if weights else 1.0
+        self._terms = []
+        for (di, dj), c in sorted(neighbours.items()):
+            for (dst_i, src_i), (dst_j, src_j) in itertools.product(
+                    _shift_pairs(self.nx, di, periodic), _shift_pairs(self.ny, dj, periodic)):
+                self._terms.append(((slice(None), dst_i, dst_j), (slice(None), src_i, src_j), c / self._scale))
+
+        # apply() makes one pass over the field per term, so it works through
+        # blocks of rows small enough to stay in cache between passes
+        rows = max(1, self.BLOCK_BYTES // (8 * self.ny))
+        self._blocks = []
+        for r0 in range(0, self.nx, rows):
+            r1 = min(self.nx, r0 + rows)
+            terms = []
+            for dst, src, weight in self._terms:
+                lo, hi = max(dst[1].start, r0), min(dst[1].stop, r1)
+                if lo < hi:
+                    shift = src[1].start - dst[1].start
+                    terms.append(((slice(None), slice(lo, hi), dst[2]),
+                                  (slice(None), slice(lo + shift, hi + shift), src[2]), weight))
+            self._blocks.append(((slice(None), slice(r0, r1)), terms))
+
+    @property
+    def matrix(self) -> sp.csr_matrix:
+        if self._matrix is None:
+            n = self.nx * self.ny
+            index = np.arange(n).reshape(1, self.nx, self.ny)
+            rows = [index.ravel()]
+            cols = [index.ravel()]
+            vals = [np.full(n, self._center)]
+            for dst, src, weight in self._terms:
+                r = index[dst].ravel()
+                rows.append(r)
+                cols.append(index[src].ravel())
+                vals.append(np.full(r.size, weight * self._scale))
+            self._matrix = sp.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                                         shape=(n, n))
+            self._matrix.eliminate_zeros()
+        return self._matrix
+
+    def apply(self, state_vector: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """Apply the stencil; `out` (same size as the state, C-contiguous) receives the result."""
+        u = state_vector.reshape(-1, self.nx, self.ny)
+        if out is None:
+            out = np.empty_like(state_vector)
+        elif not out.flags.c_contiguous:
+            raise ValueError("out must be C-contiguous")
+        o = out.reshape(u.shape)
+        center = self._center / self._scale
+        # Blocks are equal runs of rows; a tile takes the blocks starting in it
+        block_rows = self._blocks[0][0][1].stop
+
+        def rows(r0, r1):
+            for block, terms in self._blocks[-(-r0 // block_rows):-(-r1 // block_rows)]:
+                ob = o[block]
+                np.multiply(u[block], center, out=ob)
+                for dst, src, weight in terms:
+                    if weight == 1.0:
+                        np.add(o[dst], u[src], out=o[dst])
+                    else:
+                        o[dst] += weight * u[src]
+                if self._scale != 1.0:
+                    ob *= self._scale
+        get_executor().run_rows(rows, self.nx, self.ny * u.shape[0])
+        return out
+
+    def __add__(self, other):
+        if isinstance(other, StencilOperator) and other.shape == self.shape and other.boundary == self.boundary:
+            merged = dict(self.coefficients)
+            for k, v in other.coefficients.items():
+                merged[k] = merged.get(k, 0.0) + v
+            return StencilOperator(self.shape, merged, self.boundary)
+        if isinstance(other, LinearOperator):
+            return LinearOperator(self.matrix + other.matrix)
+        return NotImplemented
+
+    def __mul__(self, scalar):
+        return StencilOperator(self.shape, {k: v * scalar for k, v in self.coefficients.items()}, self.boundary)
+
+    def __getstate__(self):
+        # The CSR matrix is a cache; rebuild it on demand after unpickling
+        return dict(super().__getstate__(), _matrix=None)
+
+class SpectralOperator(LinearOperator):
+    """
+    Constant-coefficient operator on a periodic (nx, ny) grid that is
+    diagonal in Fourier space: the rfft2 coefficients of A u are `symbol`
+    times those of u (symbol has shape (nx, ny // 2 + 1)). Besides apply()
+    it can solve (I - shift*A) x = b and propagate u by exp(t*A) exactly,
+    each with one forward and one inverse transform, whatever t is.
+
+    There is no sparse matrix; integrators that need one use solve() or
+    propagate() instead. SciPy's FFT caches its plans per shape, and the
+    exp(t * symbol) factors for the last few t are kept here, so repeated
+    steps of the same length only cost the two transforms.
+    """
+    PROPAGATOR_CACHE = 8
+    has_matrix = False
+
+    def __init__(self, shape: tuple, symbol: np.ndarray):
+        self.shape = tuple(shape)
+        self.nx, self.ny = self.shape
+        self.symbol = np.asarray(symbol, dtype=np.float64)
+        if self.symbol.shape != (self.nx, self.ny // 2 + 1):
+            raise ValueError(f"symbol shape {self.symbol.shape} does not match rfft2 of {self.shape}")
+        self._propagators = {}
+
+    @property
+    def matrix(self):
+        raise ValueError("SpectralOperator has no sparse matrix")
+
+    def _transform(self, state_vector: np.ndarray, factor: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        u = state_vector.reshape(-1, self.nx, self.ny)
+        coefficients = scipy.fft.rfft2(u)
+        coefficients *= factor
+        result = scipy.fft.irfft2(coefficients, s=self.shape)
+        if out is None:
+            return result.reshape(state_vector.shape)
+        out.reshape(result.shape)[...] = result
+        return out
+
+    def apply(self, state_vector: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        return self._transform(state_vector, self.symbol, out)
+
+    def solve(self, rhs: np.ndarray, shift: float, out: np.ndarray = None) -> np.ndarray:
+        """x with (I - shift * A) x = rhs."""
+        return self._transform(rhs, 1.0 / (1.0 - shift * self.symbol), out)
+
+    def propagate(self, state_vector: np.ndarray, t: float, out: np.ndarray = None) -> np.ndarray:
+        """exp(t * A) applied to the state: the exact solution of ds/dt = A s after time t."""
+        factor = self._propagators.get(t)
+        if factor is None:
+            if len(self._propagators) >= self.PROPAGATOR_CACHE:
+                self._propagators.clear()
+            factor = np.exp(t * self.symbol)
+            self._propagators[t] = factor
+        return self._transform(state_vector, factor, out)
+
+    def __add__(self, other):
+        if isinstance(other, SpectralOperator) and other.shape == self.shape:
+            return SpectralOperator(self.shape, self.symbol + other.symbol)
+        return NotImplemented
+
+    def __mul__(self, scalar):
+        return SpectralOperator(self.shape, self.symbol * scalar)
+
+    def __getstate__(self):
+        return dict(super().__getstate__(), _propagators={})
+
+class SecondOrderOperator(LinearOperator):
+    """
+    First-order form of u'' = A u on the stacked state s = [u, u']:
+
+        ds/dt = [[0, I], [A, 0]] s
+
+    `acceleration` is A (any LinearOperator on `size` unknowns). apply()
+    works blockwise without assembling anything; `matrix` builds the block
+    matrix on first use for integrators that need one.
+    """
+    def __init__(self, acceleration: LinearOperator, size: int):
+        self.acceleration = acceleration
+        self.size = size
+        self._matrix = None
+
+    @property
+    def has_matrix(self) -> bool:
+        return self.acceleration.has_matrix
+
+    @property
+    def matrix(self) -> sp.csr_matrix:
+        if self._matrix is None:
+            identity = sp.identity(self.size, format='csr')
+            self._matrix = sp.bmat([[None, identity], [self.acceleration.matrix, None]], format='csr')
+        return self._matrix
+
+    def apply(self, state_vector: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        n = self.size
+        if out is None:
+            out = np.empty_like(state_vector)
+        out[:n] = state_vector[n:]
+        self.acceleration.apply(state_vector[:n], out=out[n:])
+        return out
+
+    def __getstate__(self):
+        return dict(super().__getstate__(), _matrix=None)
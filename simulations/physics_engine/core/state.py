@@ -23,26 +23,29 @@ class StateVector:
         for f in fields:
             if f.shape != shape:
                 raise ValueError("All fields must have the same shape")
-        
-        flat_data = np.concatenate([f.flatten() for f in fields])
-        return cls(flat_data, shape)
+
+        # Copy each field once, straight into its block of the state
+        data = np.empty(len(fields) * fields[0].size, dtype=np.result_type(*fields))
+        blocks = data.reshape((len(fields),) + shape)
+        for block, f in zip(blocks, fields):
+            block[...] = f
+        return cls(data, shape)
 
     def to_field(self) -> np.ndarray:
         """Reshape the state vector into a single 2D field."""
         return self.data.reshape(self.shape)
 
     def to_fields(self, num_fields: int) -> list[np.ndarray]:
-        """Reshape the state vector into a list of 2D fields."""
+        """
+        Split the state vector into a list of 2D fields. The fields are
+        views of the state, so writing to them updates it (and stepping the
+        state changes them).
+        """
         field_size = self.nx * self.ny
         if self.data.size != field_size * num_fields:
              raise ValueError(f"State vector size {self.data.size} does not match expected size for {num_fields} fields of shape {self.shape}")
-        
-        fields = []
-        for i in range(num_fields):
-            start = i * field_size
-            end = start + field_size
-            fields.append(self.data[start:end].reshape(self.shape))
-        return fields
+
+        return list(self.data.reshape((num_fields,) + tuple(self.shape)))
 
     def __repr__(self):
         return f"StateVector(shape={self.shape}, size={self.data.size})"
@@ -1,20 +1,35 @@
 import numpy as np
 from ..core.state import StateVector
 from ..core.operator import LinearOperator
-from ..core.integrator import Integrator, ExplicitEuler
+from ..core.integrator import Integrator, ExplicitEuler, ExponentialIntegrator, ADAPTIVE_INTEGRATORS
+from ..core.exponential import (estimate_krylov_matvecs, is_symmetric, krylov_dim,
+                                krylov_expm_multiply, operator_norm)
 
 class SimulationEnvironment:
     """
     High-level class to manage a physics simulation.
     """
-    def __init__(self, nx: int, ny: int, dt: float, operator: LinearOperator, integrator: Integrator = None):
+    # Besides each operator application, a Lanczos iteration (symmetric
+    # operators) does a few vector updates; an Arnoldi iteration
+    # orthogonalizes against the whole basis, about m/4 applications' worth
+    KRYLOV_OVERHEAD = 1.5
+
+    def __init__(self, nx: int, ny: int, dt: float, operator: LinearOperator, integrator: Integrator = None,
+                 fast_forward: bool = True):
         self.nx = nx
         self.ny = ny
         self.dt = dt
         self.operator = operator
         self.integrator = integrator or ExplicitEuler()
+        self.integrator.check(operator)
         self.state: StateVector = None
         self.t = 0.0
+        # Step size the adaptive integrator settled on, reused by the next advance_to
+        self.adaptive_dt = None
+        # With fast_forward, advance() may replace many steps by one exp(t*A)
+        self.fast_forward = fast_forward
+        self.last_advance = None
+        self._exponential = None # (operator, symmetric, norm), computed on first use
 
     def set_state(self, field: np.ndarray):
         """Set the current state from a 2D field."""
@@ -23,17 +38,113 @@ class SimulationEnvironment:
     def set_state_vector(self, state_vector: StateVector):
         self.state = state_vector
 
+    def _writable_state(self) -> np.ndarray:
+        """The state array, copied first if it cannot be updated in place."""
+        data = self.state.data
+        if (not data.flags.writeable or not data.flags.c_contiguous
+                or not np.issubdtype(data.dtype, np.floating)):
+            data = np.array(data, dtype=np.result_type(data.dtype, np.float64), order="C")
+            self.state.data = data
+        return data
+
     def step(self):
-        """Advance the simulation by one time step."""
+        """
+        Advance the simulation by one time step. The state is updated in
+        place, so arrays returned by get_field() change with it; copy them
+        to keep a frame.
+        """
         if self.state is None:
             raise ValueError("State not initialized")
-        
-        new_data = self.integrator.step(self.state.data, self.operator, self.dt)
-        self.state = StateVector(new_data, self.state.shape)
+
+        self.integrator.step_inplace(self._writable_state(), self.operator, self.dt)
         self.t += self.dt
 
+    def advance(self, steps: int) -> dict:
+        """
+        Advance by `steps` time steps, like calling step() that many times.
+        The system is linear (ds/dt = A s), so with fast_forward enabled the
+        same interval can instead be covered exactly by exp(steps*dt*A) s,
+        computed with Krylov iterations (or propagate(), for operators that
+        have it) and free of any stability limit. The cheaper path by
+        estimated operator applications is taken. The exact integrator
+        always jumps in one propagate() and reports the "exact" path. Returns
+        (and keeps in `last_advance`) the chosen path and its estimates.
+        """
+        if self.state is None:
+            raise ValueError("State not initialized")
+        if steps <= 0:
+            return self.last_advance
+        state = self._writable_state()
+        path, costs = self._advance_path(steps)
+        if path == "exponential":
+            duration = steps * self.dt
+            if hasattr(self.operator, "propagate"):
+                self.operator.propagate(state, duration, out=state)
+            else:
+                _, symmetric, _ = self._exponential
+                state[...], _ = krylov_expm_multiply(self.operator, state, duration, symmetric=symmetric)
+        else:
+            self.integrator.advance(state, self.operator, self.dt, steps)
+        self.t += steps * self.dt
+        self.last_advance = {"path": path, "steps": steps, "estimated_evaluations": costs}
+        return self.last_advance
+
+    def _advance_path(self, steps: int):
+        if isinstance(self.integrator, ExponentialIntegrator):
+            # One propagate() covers any number of steps
+            return "exact", {"exact": 1.0}
+        evaluations = self.integrator.evaluations
+        if not self.fast_forward or steps < 2 or evaluations is None:
+            return "stepping", None
+        stepping = float(steps * evaluations)
+        if hasattr(self.operator, "propagate"):
+            exponential = 1.0
+        else:
+            if self._exponential is None or self._exponential[0] is not self.operator:
+                self._exponential = (self.operator, is_symmetric(self.operator), operator_norm(self.operator))
+            _, symmetric, norm = self._exponential
+            m = krylov_dim(self.state.data.size)
+            overhead = self.KRYLOV_OVERHEAD if symmetric else 1.0 + m / 4
+            exponential = overhead * estimate_krylov_matvecs(
+                self.operator, steps * self.dt, m, symmetric=symmetric, norm=norm)
+        path = "exponential" if exponential < stepping else "stepping"
+        return path, {"stepping": stepping, "exponential": exponential}
+
+    def advance_to(self, t_end: float, rtol: float = 1e-6, atol: float = 1e-9,
+                   method: str = "dormand_prince", max_steps: int = 100_000) -> dict:
+        """
+        Advance to time `t_end` with an adaptive embedded Runge-Kutta pair
+        instead of fixed `dt` steps. Returns the integrator's accepted and
+        rejected step counts and operator evaluations, plus the number of
+        fixed steps the same interval would have taken.
+        """
+        if self.state is None:
+            raise ValueError("State not initialized")
+        if method not in ADAPTIVE_INTEGRATORS:
+            raise ValueError(f"Unknown adaptive method '{method}', expected one of {sorted(ADAPTIVE_INTEGRATORS)}")
+        duration = t_end - self.t
+        if duration < 0:
+            raise ValueError(f"t_end {t_end} is before the current time {self.t}")
+
+        integrator = ADAPTIVE_INTEGRATORS[method]()
+        data, stats = integrator.integrate(self.state.data, self.operator, duration, rtol=rtol, atol=atol,
+                                           dt=self.adaptive_dt, max_steps=max_steps)
+        self._writable_state()[...] = data
+        self.t = t_end
+        if stats["dt"] is not None:
+            self.adaptive_dt = stats["dt"]
+        stats["method"] = method
+        stats["fixed_steps"] = int(np.ceil(duration / self.dt - 1e-9)) if self.dt > 0 else None
+        return stats
+
     def get_field(self) -> np.ndarray:
-        """Get the current state as a 2D field."""
+        """Get the current state (its first field, for multi-field states) as a 2D field (a view, updated by step())."""
+        if self.state is None:
+            return None
+        return self.get_fields()[0]
+
+    def get_fields(self) -> list:
+        """All fields of the state, as 2D views."""
         if self.state is None:
             return None
-        return self.state.to_field()
+        return self.state.to_fields(self.state.data.size // (self.nx * self.ny))
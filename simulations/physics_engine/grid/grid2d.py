@@ -14,7 +14,16 @@ class Grid2D:
         
         self.x = np.linspace(0, lx, nx)
         self.y = np.linspace(0, ly, ny)
-        self.X, self.Y = np.meshgrid(self.x, self.y, indexing='ij')
+
+    # X and Y are read-only broadcast views of x and y, the same values as an
+    # ij-indexed meshgrid without storing two full (nx, ny) arrays per grid
+    @property
+    def X(self):
+        return np.broadcast_to(self.x[:, np.newaxis], self.shape)
+
+    @property
+    def Y(self):
+        return np.broadcast_to(self.y[np.newaxis, :], self.shape)
 
     @property
     def shape(self):
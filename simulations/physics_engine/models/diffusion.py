@@ -1,6 +1,8 @@
+import threading
+from collections import OrderedDict
 import numpy as np
 import scipy.sparse as sp
-from ..core.operator import LinearOperator
+from ..core.operator import LinearOperator, SpectralOperator, StencilOperator
 from ..grid.grid2d import Grid2D
 
 def build_laplacian(nx: int, ny: int, dx: float, dy: float) -> sp.spmatrix:
@@ -15,12 +17,11 @@ def build_laplacian(nx: int, ny: int, dx: float, dy: float) -> sp.spmatrix:
     off_diag_x = np.ones(n - 1)
     off_diag_y = np.ones(n - ny)
     
-    # Adjust for boundaries (simplified)
+    # Adjust for boundaries
     # In a flattened array, x-neighbors are +/- 1, y-neighbors are +/- ny
-    # We need to zero out connections that wrap around the grid in X
-    for i in range(1, n):
-        if i % nx == 0:
-            off_diag_x[i-1] = 0
+    # We need to zero out connections that wrap from the end of one row of
+    # ny cells to the start of the next
+    off_diag_x[ny - 1::ny] = 0
     
     diagonals = [main_diag, off_diag_x, off_diag_x, off_diag_y, off_diag_y]
     offsets = [0, 1, -1, ny, -ny]
@@ -31,12 +32,131 @@ def build_laplacian(nx: int, ny: int, dx: float, dy: float) -> sp.spmatrix:
     laplacian /= (dx * dy) 
     return laplacian
 
+def build_laplacian_stencil(nx: int, ny: int, dx: float, dy: float) -> StencilOperator:
+    """
+    Matrix-free equivalent of build_laplacian: the same 5-point stencil,
+    zero Dirichlet boundaries and 1/(dx*dy) scaling.
+    """
+    h = 1.0 / (dx * dy)
+    return StencilOperator((nx, ny), {(0, 0): -4.0 * h, (1, 0): h, (-1, 0): h, (0, 1): h, (0, -1): h})
+
+def build_laplacian_spectral(nx: int, ny: int, dx: float, dy: float) -> SpectralOperator:
+    """
+    Laplacian on the periodic nx*dx by ny*dy domain in Fourier space:
+    symbol -(kx^2 + ky^2), exact for every resolved wavenumber.
+    """
+    kx = 2 * np.pi * np.fft.fftfreq(nx, d=dx)
+    ky = 2 * np.pi * np.fft.rfftfreq(ny, d=dy)
+    return SpectralOperator((nx, ny), -(kx[:, None] ** 2 + ky[None, :] ** 2))
+
+OPERATOR_BACKENDS = ("csr", "stencil", "spectral")
+
+# Sessions on identical grids share one (read-only) operator. The cache is
+# bounded by the bytes of the assembled matrices it holds.
+OPERATOR_CACHE_BYTES = 512 * 1024 * 1024
+_operator_cache = OrderedDict()
+_operator_cache_lock = threading.Lock()
+
+def _operator_nbytes(operator: LinearOperator) -> int:
+    if isinstance(operator, StencilOperator):
+        return 0
+    if isinstance(operator, SpectralOperator):
+        return operator.symbol.nbytes
+    m = operator.matrix
+    return m.data.nbytes + m.indices.nbytes + m.indptr.nbytes
+
+def _freeze(operator: LinearOperator) -> LinearOperator:
+    operator.shared = True
+    if isinstance(operator, SpectralOperator):
+        operator.symbol.flags.writeable = False
+    elif not isinstance(operator, StencilOperator):
+        for arr in (operator.matrix.data, operator.matrix.indices, operator.matrix.indptr):
+            arr.flags.writeable = False
+    return operator
+
+def _build_operators(backend: str, nx: int, ny: int, dx: float, dy: float, diffusivity: float):
+    if backend in ("stencil", "spectral"):
+        build = build_laplacian_stencil if backend == "stencil" else build_laplacian_spectral
+        laplacian = build(nx, ny, dx, dy)
+        return laplacian, laplacian * diffusivity
+    laplacian = build_laplacian(nx, ny, dx, dy)
+    return laplacian, LinearOperator(laplacian * diffusivity)
+
+def get_diffusion_operators(backend: str, nx: int, ny: int, dx: float, dy: float, diffusivity: float):
+    """
+    (laplacian, D * laplacian operator) for a grid, from the shared cache.
+    The returned objects are shared between callers and their arrays are
+    read-only; combine them with + and * (which build new operators)
+    instead of modifying them.
+    """
+    key = (backend, nx, ny, float(dx), float(dy), float(diffusivity))
+    with _operator_cache_lock:
+        entry = _operator_cache.get(key)
+        if entry is not None:
+            _operator_cache.move_to_end(key)
+            return entry[0], entry[1]
+
+    laplacian, operator = _build_operators(*key)
+    if backend == "csr":
+        # A bare sparse matrix; sessions only hold the operator built from it
+        laplacian.data.flags.writeable = False
+        nbytes = _operator_nbytes(operator) + _operator_nbytes(LinearOperator(laplacian))
+    else:
+        _freeze(laplacian)
+        nbytes = _operator_nbytes(operator) + _operator_nbytes(laplacian)
+    _freeze(operator)
+
+    with _operator_cache_lock:
+        # Another thread may have built it meanwhile; keep the first copy
+        entry = _operator_cache.setdefault(key, (laplacian, operator, nbytes))
+        _operator_cache.move_to_end(key)
+        total = sum(e[2] for e in _operator_cache.values())
+        while total > OPERATOR_CACHE_BYTES and len(_operator_cache) > 1:
+            _, evicted = _operator_cache.popitem(last=False)
+            total -= evicted[2]
+    return entry[0], entry[1]
+
+def operator_cache_nbytes() -> int:
+    """Bytes held by the cached operators, which sessions share rather than own."""
+    with _operator_cache_lock:
+        return sum(e[2] for e in _operator_cache.values())
+
+def clear_operator_cache():
+    with _operator_cache_lock:
+        _operator_cache.clear()
+
 class DiffusionModel:
-    def __init__(self, grid: Grid2D, diffusivity: float):
+    """
+    ds/dt = D * Laplacian(s). `backend` picks how the Laplacian is applied:
+    "csr" (an assembled sparse matrix) or "stencil" (matrix-free slicing,
+    less memory and usually faster; its `matrix` is built only if an
+    implicit integrator asks for it) or "spectral" (periodic boundaries,
+    applied with FFTs; see SpectralDiffusionModel). With `shared=True` the operators come
+    from a process-wide cache and are shared, read-only, with every other
+    model on the same grid and diffusivity.
+    """
+    def __init__(self, grid: Grid2D, diffusivity: float, backend: str = "csr", shared: bool = True):
+        if backend not in OPERATOR_BACKENDS:
+            raise ValueError(f"Unknown operator backend '{backend}', expected one of {OPERATOR_BACKENDS}")
         self.grid = grid
         self.diffusivity = diffusivity
-        self.laplacian = build_laplacian(grid.nx, grid.ny, grid.dx, grid.dy)
-        self.operator = LinearOperator(self.laplacian * diffusivity)
+        self.backend = backend
+        args = (backend, grid.nx, grid.ny, grid.dx, grid.dy, diffusivity)
+        if shared:
+            self.laplacian, self.operator = get_diffusion_operators(*args)
+        else:
+            self.laplacian, self.operator = _build_operators(*args)
 
     def get_operator(self) -> LinearOperator:
         return self.operator
+
+class SpectralDiffusionModel(DiffusionModel):
+    """
+    Diffusion on a periodic Grid2D solved in Fourier space, where the
+    Laplacian is diagonal. With the "exact" integrator, advancing any time t
+    is one rfft2, a multiply by exp(-D k^2 t) and one inverse transform, so
+    the step size only sets the output interval and N steps cost the same
+    as one.
+    """
+    def __init__(self, grid: Grid2D, diffusivity: float, shared: bool = True):
+        super().__init__(grid, diffusivity, backend="spectral", shared=shared)
@@ -0,0 +1,39 @@
+import numpy as np
+from ..core.operator import SecondOrderOperator
+from ..core.state import StateVector
+from ..grid.grid2d import Grid2D
+from .diffusion import OPERATOR_BACKENDS, get_diffusion_operators
+
+class WaveModel:
+    """
+    u_tt = c^2 * Laplacian(u), stepped as the first-order system for the
+    stacked state [u, u_t] (see SecondOrderOperator). The c^2-scaled
+    Laplacian comes from the same operator cache as DiffusionModel, so
+    `backend` works the same way: "csr", "stencil" or "spectral"
+    (periodic); the operators are shared and read-only. Boundaries other
+    than periodic hold u = 0 and reflect.
+    Pair it with the "verlet" integrator, which conserves the wave's energy.
+    """
+    def __init__(self, grid: Grid2D, wave_speed: float, backend: str = "csr"):
+        if backend not in OPERATOR_BACKENDS:
+            raise ValueError(f"Unknown operator backend '{backend}', expected one of {OPERATOR_BACKENDS}")
+        self.grid = grid
+        self.wave_speed = wave_speed
+        self.backend = backend
+        self.laplacian, acceleration = get_diffusion_operators(backend, grid.nx, grid.ny, grid.dx, grid.dy,
+                                                               wave_speed ** 2)
+        self.operator = SecondOrderOperator(acceleration, grid.nx * grid.ny)
+
+    def get_operator(self) -> SecondOrderOperator:
+        return self.operator
+
+    def initial_state(self, displacement: np.ndarray, velocity: np.ndarray = None) -> StateVector:
+        if velocity is None:
+            velocity = np.zeros_like(displacement)
+        return StateVector.from_fields([displacement, velocity])
+
+    def energy(self, state: StateVector) -> float:
+        """Discrete energy (1/2) * sum(u_t^2 - u * c^2 Laplacian(u)) * dx * dy, conserved by the wave."""
+        u, v = state.to_fields(2)
+        au = self.operator.acceleration.apply(u.ravel())
+        return 0.5 * float(np.dot(v.ravel(), v.ravel()) - np.dot(u.ravel(), au)) * self.grid.dx * self.grid.dy
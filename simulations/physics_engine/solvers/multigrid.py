@@ -0,0 +1,333 @@
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+from ..core.operator import StencilOperator
+from ..grid.grid2d import Grid2D
+
+BOUNDARIES = ("dirichlet", "neumann", "periodic")
+CYCLES = ("V", "W", "F")
+
+# Coarse-grid visits per cycle type: a W-cycle visits the next level twice,
+# an F-cycle once with an F-cycle and once with a V-cycle
+_VISITS = {"V": ("V",), "W": ("W", "W"), "F": ("F", "V")}
+
+class _Level:
+    """Fields and coefficients of one grid in the hierarchy."""
+    def __init__(self, shape, spacing, alpha, beta, boundary, ghost, dtype):
+        self.nx, self.ny = shape
+        self.wx = beta / spacing[0] ** 2
+        self.wy = beta / spacing[1] ** 2
+        # Dirichlet ghost cells hold `ghost` times the boundary cell (see
+        # MultigridSolver), Neumann ones a copy of it. Both are folded into
+        # the diagonal, so the ghost layer itself stays zero.
+        self.ghost = ghost if boundary == "dirichlet" else 1.0
+        diag = np.full(shape, alpha + 2 * self.wx + 2 * self.wy, dtype=dtype)
+        if boundary != "periodic":
+            diag[0, :] -= self.wx * self.ghost
+            diag[-1, :] -= self.wx * self.ghost
+            diag[:, 0] -= self.wy * self.ghost
+            diag[:, -1] -= self.wy * self.ghost
+        self.diag = diag
+        self.inv_diag = 1.0 / diag
+        # The solution lives inside a one-cell ghost border
+        self.padded = np.zeros((self.nx + 2, self.ny + 2), dtype=dtype)
+        self.u = self.padded[1:-1, 1:-1]
+        self.f = np.zeros(shape, dtype=dtype)
+        self.r = np.zeros(shape, dtype=dtype)
+
+class MultigridSolver:
+    """
+    Geometric multigrid for the Helmholtz problem on a cell-centred grid:
+
+        alpha * u - beta * Laplacian(u) = f
+
+    with the 5-point Laplacian (1/dx^2 and 1/dy^2 weights). alpha = 0,
+    beta = 1 is the Poisson equation; alpha = 1, beta = theta*dt*D is an
+    implicit diffusion step. Boundaries:
+
+    - "dirichlet": u = 0 one cell outside the grid, the convention of
+      build_laplacian. Coarse grids place their boundary at the same
+      physical position.
+    - "neumann": zero flux across the grid edge.
+    - "periodic": wrap-around.
+
+    Each level halves both sides while they are even, down to about
+    `coarse_size` cells, where the system is solved directly; a grid whose
+    sides are divisible by a large power of two therefore gets the deepest
+    hierarchy. Odd sides cannot be halved, so a grid whose coarsest level
+    would still exceed `max_coarse` cells (an odd 501x501 grid would be
+    factorized whole) raises ValueError; callers then use another solver. Smoothing is red-black Gauss-Seidel, restriction and
+    prolongation are bilinear (restriction is the scaled transpose of
+    prolongation, so a cycle is symmetric and can precondition CG). All
+    three work on whole array slices and cost O(n) per cycle.
+
+    With alpha = 0 and no Dirichlet boundary the problem is only solvable
+    for zero-mean f; the mean is removed from f and from the solution.
+
+    The solver keeps work arrays for every level, so one instance should
+    not be used from several threads at once. They are float64 unless
+    `dtype` says otherwise (float32 halves them, for float32 fields).
+    """
+    def __init__(self, shape: tuple, spacing: tuple = (1.0, 1.0), boundary: str = "dirichlet",
+                 alpha: float = 0.0, beta: float = 1.0, cycle: str = "V",
+                 pre_smooth: int = 2, post_smooth: int = 2, coarse_size: int = 64, max_coarse: int = 16_384,
+                 dtype=np.float64):
+        if boundary not in BOUNDARIES:
+            raise ValueError(f"Unknown boundary '{boundary}', expected one of {BOUNDARIES}")
+        if cycle not in CYCLES:
+            raise ValueError(f"Unknown cycle '{cycle}', expected one of {CYCLES}")
+        if alpha < 0 or beta <= 0:
+            raise ValueError("alpha must not be negative and beta must be positive")
+        self._args = dict(shape=shape, spacing=spacing, boundary=boundary, alpha=alpha, beta=beta,
+                          cycle=cycle, pre_smooth=pre_smooth, post_smooth=post_smooth,
+                          coarse_size=coarse_size, max_coarse=max_coarse, dtype=dtype)
+        self.shape = tuple(shape)
+        self.spacing = tuple(float(h) for h in spacing)
+        self.boundary = boundary
+        self.alpha = alpha
+        self.beta = beta
+        self.cycle_type = cycle
+        self.pre_smooth = pre_smooth
+        self.post_smooth = post_smooth
+        self.singular = alpha == 0 and boundary != "dirichlet"
+        self.dtype = np.dtype(dtype)
+
+        # Check the coarsest level first, before allocating any
+        nx, ny = self.shape
+        while not (nx % 2 or ny % 2 or nx * ny <= coarse_size):
+            nx, ny = nx // 2, ny // 2
+        if nx * ny > max_coarse:
+            raise ValueError(f"Grid {self.shape} only coarsens to {nx}x{ny} cells, "
+                             f"more than max_coarse={max_coarse} to solve directly")
+
+        self.levels = []
+        (nx, ny), (hx, hy) = self.shape, self.spacing
+        while True:
+            # Keep the Dirichlet boundary where the finest grid has it: half
+            # a fine cell beyond the edge, matched by a linear extrapolation
+            # from the coarse ghost cell centre
+            ghost = -(hx - self.spacing[0]) / (hx + self.spacing[0])
+            self.levels.append(_Level((nx, ny), (hx, hy), alpha, beta, boundary, ghost, self.dtype))
+            if nx % 2 or ny % 2 or nx * ny <= coarse_size:
+                break
+            nx, ny, hx, hy = nx // 2, ny // 2, 2 * hx, 2 * hy
+        self._coarse_solve = self._factorize(self.levels[-1])
+
+    @classmethod
+    def for_grid(cls, grid: Grid2D, **options) -> "MultigridSolver":
+        return cls(grid.shape, (grid.dx, grid.dy), **options)
+
+    @classmethod
+    def for_operator(cls, operator: StencilOperator, alpha: float = 1.0, beta: float = 1.0,
+                     **options) -> "MultigridSolver":
+        """
+        Solver for alpha*u - beta*(A u) = f where A is a StencilOperator
+        holding a 5-point Laplacian (e.g. the "stencil" diffusion operator).
+        Raises ValueError for any other operator.
+        """
+        if not isinstance(operator, StencilOperator):
+            raise ValueError("Multigrid needs a StencilOperator")
+        c = operator.coefficients
+        cx, cy = c.get((1, 0), 0.0), c.get((0, 1), 0.0)
+        if (set(c) - {(0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)} or cx <= 0 or cy <= 0
+                or c.get((-1, 0)) != cx or c.get((0, -1)) != cy
+                or not np.isclose(c.get((0, 0), 0.0), -2 * (cx + cy))):
+            raise ValueError("Multigrid needs a 5-point Laplacian stencil")
+        return cls(operator.shape, (1 / np.sqrt(cx), 1 / np.sqrt(cy)), operator.boundary,
+                   alpha=alpha, beta=beta, **options)
+
+    def __getstate__(self):
+        # Work arrays and the coarse factorization are rebuilt on unpickling
+        return self._args
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    # --- Level operations ---
+
+    def _wrap(self, level: _Level):
+        if self.boundary == "periodic":
+            p = level.padded
+            p[0, 1:-1] = p[-2, 1:-1]
+            p[-1, 1:-1] = p[1, 1:-1]
+            p[:, 0] = p[:, -2]
+            p[:, -1] = p[:, 1]
+
+    def _smooth(self, level: _Level, sweeps: int, reverse: bool = False):
+        p, nx, ny = level.padded, level.nx, level.ny
+        for _ in range(sweeps):
+            for color in ((1, 0) if reverse else (0, 1)):
+                self._wrap(level)
+                for a in (0, 1):
+                    b = (a + color) % 2
+                    rows, cols = slice(1 + a, nx + 1, 2), slice(1 + b, ny + 1, 2)
+                    cells = (slice(a, nx, 2), slice(b, ny, 2))
+                    neighbours = level.wx * (p[a:nx:2, cols] + p[2 + a:nx + 2:2, cols])
+                    neighbours += level.wy * (p[rows, b:ny:2] + p[rows, 2 + b:ny + 2:2])
+                    neighbours += level.f[cells]
+                    neighbours *= level.inv_diag[cells]
+                    p[rows, cols] = neighbours
+
+    def _residual(self, level: _Level) -> np.ndarray:
+        self._wrap(level)
+        p = level.padded
+        r = level.r
+        np.multiply(level.diag, level.u, out=r)
+        r -= level.wx * (p[:-2, 1:-1] + p[2:, 1:-1])
+        r -= level.wy * (p[1:-1, :-2] + p[1:-1, 2:])
+        np.subtract(level.f, r, out=r)
+        return r
+
+    def _fill_ghosts(self, level: _Level):
+        """Real ghost values (not folded into the diagonal), for prolongation."""
+        if self.boundary == "periodic":
+            # Columns are wrapped after rows, which fills the corners too
+            self._wrap(level)
+            return
+        p = level.padded
+        g = level.ghost
+        p[0, 1:-1] = g * p[1, 1:-1]
+        p[-1, 1:-1] = g * p[-2, 1:-1]
+        p[:, 0] = g * p[:, 1]
+        p[:, -1] = g * p[:, -2]
+
+    def _clear_ghosts(self, level: _Level):
+        p = level.padded
+        p[0, :] = p[-1, :] = p[:, 0] = p[:, -1] = 0.0
+
+    def _fold_ghosts(self, level: _Level, acc: np.ndarray):
+        """Adjoint of _fill_ghosts: move ghost-layer sums onto the cells they came from."""
+        if self.boundary == "periodic":
+            acc[:, -2] += acc[:, 0]
+            acc[:, 1] += acc[:, -1]
+            acc[-2, 1:-1] += acc[0, 1:-1]
+            acc[1, 1:-1] += acc[-1, 1:-1]
+            return
+        g = level.ghost
+        acc[:, 1] += g * acc[:, 0]
+        acc[:, -2] += g * acc[:, -1]
+        acc[1, 1:-1] += g * acc[0, 1:-1]
+        acc[-2, 1:-1] += g * acc[-1, 1:-1]
+
+    @staticmethod
+    def _stencil(a: int, b: int, nx: int, ny: int):
+        """Bilinear weights and coarse (padded) slices feeding fine cells (2I + a, 2J + b)."""
+        di, dj = (-1 if a == 0 else 1), (-1 if b == 0 else 1)
+        rows, cols = slice(1, nx + 1), slice(1, ny + 1)
+        rows_n, cols_n = slice(1 + di, nx + 1 + di), slice(1 + dj, ny + 1 + dj)
+        return ((9 / 16, rows, cols), (3 / 16, rows_n, cols), (3 / 16, rows, cols_n), (1 / 16, rows_n, cols_n))
+
+    def _prolong_add(self, coarse: _Level, fine: _Level):
+        self._fill_ghosts(coarse)
+        e = coarse.padded
+        for a in (0, 1):
+            for b in (0, 1):
+                target = fine.u[a::2, b::2]
+                for weight, rows, cols in self._stencil(a, b, coarse.nx, coarse.ny):
+                    target += weight * e[rows, cols]
+        self._clear_ghosts(coarse)
+
+    def _restrict(self, fine: _Level, coarse: _Level):
+        r = self._residual(fine)
+        acc = np.zeros_like(coarse.padded)
+        for a in (0, 1):
+            for b in (0, 1):
+                source = r[a::2, b::2]
+                for weight, rows, cols in self._stencil(a, b, coarse.nx, coarse.ny):
+                    acc[rows, cols] += weight * source
+        self._fold_ghosts(coarse, acc)
+        np.multiply(acc[1:-1, 1:-1], 0.25, out=coarse.f)
+
+    def _factorize(self, level: _Level):
+        """Direct solver for the coarsest level (bordered to fix the mean when singular)."""
+        nx, ny = level.nx, level.ny
+        n = nx * ny
+        index = np.arange(n).reshape(nx, ny)
+        rows, cols, vals = [index.ravel()], [index.ravel()], [level.diag.ravel()]
+        for axis, w in ((0, level.wx), (1, level.wy)):
+            for shift in (1, -1):
+                neighbour = np.roll(index, -shift, axis=axis)
+                keep = np.ones((nx, ny), dtype=bool)
+                if self.boundary != "periodic":
+                    edge = [slice(None), slice(None)]
+                    edge[axis] = -1 if shift == 1 else 0
+                    keep[tuple(edge)] = False
+                rows.append(index[keep])
+                cols.append(neighbour[keep])
+                vals.append(np.full(int(keep.sum()), -w))
+        matrix = sp.csc_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                               shape=(n, n))
+        if self.singular:
+            ones = sp.csc_matrix(np.ones((n, 1)))
+            bordered = sp.bmat([[matrix, ones], [ones.T, None]], format='csc')
+            lu = spla.splu(bordered)
+            return lambda f: lu.solve(np.append(f.ravel(), 0.0))[:n].reshape(nx, ny)
+        lu = spla.splu(matrix)
+        return lambda f: lu.solve(f.ravel()).reshape(nx, ny)
+
+    def _cycle(self, index: int, kind: str):
+        level = self.levels[index]
+        if index == len(self.levels) - 1:
+            level.u[...] = self._coarse_solve(level.f)
+            return
+        coarse = self.levels[index + 1]
+        self._smooth(level, self.pre_smooth)
+        self._restrict(level, coarse)
+        coarse.u[...] = 0.0
+        for visit in _VISITS[kind]:
+            self._cycle(index + 1, visit)
+        self._prolong_add(coarse, level)
+        self._smooth(level, self.post_smooth, reverse=True)
+
+    # --- Public interface ---
+
+    def _load(self, rhs: np.ndarray, x0: np.ndarray = None) -> _Level:
+        fine = self.levels[0]
+        fine.f[...] = np.reshape(rhs, self.shape)
+        if self.singular:
+            fine.f -= fine.f.mean()
+        fine.u[...] = 0.0 if x0 is None else np.reshape(x0, self.shape)
+        return fine
+
+    def _result(self, fine: _Level) -> np.ndarray:
+        u = fine.u.copy()
+        if self.singular:
+            u -= u.mean()
+        return u
+
+    def solve(self, rhs: np.ndarray, x0: np.ndarray = None, rtol: float = 1e-8, atol: float = 0.0,
+              maxiter: int = 100, cycle: str = None):
+        """
+        Cycle until ||f - A u|| <= max(rtol * ||f||, atol).
+        Returns (u, info) with u shaped like the grid and info holding the
+        cycle count, final residual norm and whether it converged.
+        """
+        kind = cycle or self.cycle_type
+        if kind not in CYCLES:
+            raise ValueError(f"Unknown cycle '{kind}', expected one of {CYCLES}")
+        fine = self._load(rhs, x0)
+        target = max(rtol * np.linalg.norm(fine.f), atol)
+        residual = float(np.linalg.norm(self._residual(fine)))
+        iterations = 0
+        while residual > target and iterations < maxiter:
+            self._cycle(0, kind)
+            iterations += 1
+            residual = float(np.linalg.norm(self._residual(fine)))
+        info = {"iterations": iterations, "residual": residual, "converged": bool(residual <= target)}
+        return self._result(fine), info
+
+    def precondition(self, rhs: np.ndarray) -> np.ndarray:
+        """One cycle from a zero guess: an approximate inverse of the operator."""
+        fine = self._load(rhs)
+        self._cycle(0, self.cycle_type)
+        return self._result(fine).reshape(np.shape(rhs))
+
+    def as_preconditioner(self) -> spla.LinearOperator:
+        """The cycle as a SciPy LinearOperator on flattened fields, e.g. for spla.cg(M=...)."""
+        n = self.shape[0] * self.shape[1]
+        return spla.LinearOperator((n, n), matvec=self.precondition, dtype=np.float64)
+
+    def apply(self, u: np.ndarray) -> np.ndarray:
+        """alpha*u - beta*Laplacian(u), the operator being inverted."""
+        fine = self._load(np.zeros(self.shape), u)
+        return (-self._residual(fine)).reshape(np.shape(u))
@@ -5,18 +5,18 @@ class VenusEnvironment:
     """
     Simulates Venusian atmosphere: high pressure, heat, and super-rotation winds.
     """
-    def __init__(self, nx: int, ny: int):
+    def __init__(self, nx: int, ny: int, dtype=np.float64):
         self.grid = Grid2D(nx, ny)
         
         # Temperature field (Kelvin) - very hot
-        self.temp = np.ones((nx, ny)) * 737.0 
+        self.temp = np.full((nx, ny), 737.0, dtype=dtype)
         
         # Wind velocity (zonal flow)
-        self.u_wind = np.ones((nx, ny)) * 100.0 # Super-rotation (m/s)
-        self.v_wind = np.zeros((nx, ny))
+        self.u_wind = np.full((nx, ny), 100.0, dtype=dtype) # Super-rotation (m/s)
+        self.v_wind = np.zeros((nx, ny), dtype=dtype)
         
         # Cloud density (sulfuric acid clouds)
-        self.clouds = np.random.rand(nx, ny) * 0.5 + 0.5
+        self.clouds = (np.random.rand(nx, ny) * 0.5 + 0.5).astype(dtype, copy=False)
         
         self.dt = 0.1
 